@@ -33,6 +33,15 @@ redis_client = Redis.from_url(
 )
 app.extensions["redis"] = redis_client
 
+# Binary-safe client for packed values (embedding vectors)
+app.extensions["redis_bytes"] = Redis.from_url(
+    app.config["REDIS_URI"],
+    decode_responses=False,
+    socket_connect_timeout=5,
+    socket_timeout=5,
+    retry_on_timeout=True
+)
+
 # Rate limiter setup
 limiter.init_app(app)
 
@@ -51,6 +60,13 @@ app.config.update(
     RESEND_API_KEY=os.getenv("RESEND_API_KEY"),
     OPENAI_API_KEY=os.getenv("OPENAI_API_KEY"),
     YT_API_KEYS=[k.strip() for k in os.getenv("GOOGLE_YT_API_KEYS", "").split(",") if k.strip()],
+    YT_DAILY_QUOTA=int(os.getenv("GOOGLE_YT_DAILY_QUOTA", "10000")),
+    YT_API_ENDPOINT=os.getenv("GOOGLE_YT_API_ENDPOINT"),
+    EMBEDDING_BACKEND=os.getenv("EMBEDDING_BACKEND", "openai"),
+    EMBEDDING_DIMENSIONS=int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS", "0")) or None,
+    EMBEDDING_CODEC=os.getenv("EMBEDDING_CODEC", "float16"),
+    # User IDs, not emails: users can set their own email without verifying it
+    ADMIN_USER_IDS=[u.strip() for u in os.getenv("ADMIN_USER_IDS", "").split(",") if u.strip()],
 )
 
 # Logging setup
@@ -60,6 +76,14 @@ handler.setLevel(logging.INFO)
 handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
 app.logger.addHandler(handler)
 
+# YouTube client pool
+from utils.youtube_api import init_youtube_clients
+init_youtube_clients(app)
+
+# Shared, batching OpenAI embeddings client
+from utils.embeddings import init_embedding_service
+init_embedding_service(app)
+
 @app.before_request
 def log_request_info():
     if not request.path.startswith("/static") and request.method != "GET":
@@ -76,6 +100,7 @@ from routes.competitor_tracker import competitor_tracker_bp
 from routes.generators import generators_bp
 from routes.notifications import notifications_bp
 from routes.outliers import outliers_bp
+from routes.admin import admin_bp
 
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(settings_bp, url_prefix="/api/settings")
@@ -86,6 +111,7 @@ app.register_blueprint(competitor_tracker_bp, url_prefix="/api/competitor-tracke
 app.register_blueprint(generators_bp, url_prefix="/api/generators")
 app.register_blueprint(notifications_bp, url_prefix="/api/notifications")
 app.register_blueprint(outliers_bp, url_prefix="/api/outliers")
+app.register_blueprint(admin_bp, url_prefix="/api/admin")
 
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
@@ -107,7 +133,8 @@ def handle_rate_limit(e):
 
 # APScheduler
 from apscheduler.schedulers.background import BackgroundScheduler
-from utils.scheduled_jobs import refresh_all_outliers_for_all_users, check_competitors_for_all_users
+from utils.scheduled_jobs import refresh_all_outliers_for_all_users, check_competitors_for_all_users, preanalyze_competitors
+from utils.channel_catalog import rebuild_catalog_index
 
 def run_in_app_context(func):
     with app.app_context():
@@ -116,5 +143,7 @@ def run_in_app_context(func):
 scheduler = BackgroundScheduler()
 scheduler.add_job(lambda: run_in_app_context(refresh_all_outliers_for_all_users), trigger="cron", hour=3)
 scheduler.add_job(lambda: run_in_app_context(check_competitors_for_all_users), trigger="cron", minute=0)
+scheduler.add_job(lambda: run_in_app_context(rebuild_catalog_index), trigger="interval", minutes=30)
+scheduler.add_job(lambda: run_in_app_context(preanalyze_competitors), trigger="cron", hour=2)
 scheduler.start()
 atexit.register(lambda: scheduler.shutdown())
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+End-to-end benchmark for the Streamline backend against the offline stand-in.
+
+Starts bench.standin in-process, points the app at it plus a local Mongo and Redis,
+seeds a user with a channel and competitors, then runs every blueprint route and the
+scheduled jobs. Reports p50/p95 latency, external calls and YouTube quota units per
+operation. Routes that change state are followed by an unmeasured teardown that puts
+the seed data back.
+
+    cd backend
+    python -m bench.run --iterations 5 --youtube-latency-ms 80 --openai-latency-ms 400
+
+Account-destructive routes (settings delete/update email/password, Google OAuth,
+password reset emails) are skipped.
+"""
+from werkzeug.serving import make_server
+from datetime import datetime, timezone
+from statistics import median
+import argparse, json, logging, os, sys, threading, time
+import requests
+
+from bench.standin import create_standin_app, CHANNELS
+
+BENCH_EMAIL = "bench@streamline.local"
+BENCH_PASSWORD = "Bench-Passw0rd!"
+NICHE_QUERY = {"query": "history documentaries", "time_frame": "last_month", "video_type": "longform"}
+# Fixed, so it can be listed in ADMIN_USER_IDS before the app is imported
+BENCH_USER_ID = "65a000000000000000000001"
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def start_standin(port, youtube_latency_ms, openai_latency_ms):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, create_standin_app(youtube_latency_ms, openai_latency_ms), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def configure_env(args):
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "MONGO_URI": args.mongo_uri,
+        "REDIS_URI": args.redis_uri,
+        "GOOGLE_YT_API_KEYS": "bench-key-1,bench-key-2,bench-key-3",
+        "GOOGLE_YT_API_ENDPOINT": f"{base}/",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "JWT_KEY": "bench-jwt-key",
+        "JWT_REFRESH_KEY": "bench-jwt-refresh-key",
+        "EMBEDDING_BACKEND": args.embedding_backend,
+        "ADMIN_USER_IDS": BENCH_USER_ID,
+    })
+    return base
+
+def seed(app, mongo, redis):
+    from argon2 import PasswordHasher
+    from bson import ObjectId
+
+    redis.flushdb()
+    for name in mongo.db.list_collection_names():
+        mongo.db.drop_collection(name)
+
+    user_channel, competitor = CHANNELS[0], CHANNELS[20]
+    list_id, scratch_list_id = ObjectId(), ObjectId()
+    user_id = mongo.db.users.insert_one({
+        "_id": ObjectId(BENCH_USER_ID),
+        "email": BENCH_EMAIL,
+        "password": PasswordHasher().hash(BENCH_PASSWORD),
+        "notificationsEnabled": True,
+        "channels": [{
+            "handle": "@bench",
+            "channelId": user_channel["id"],
+            "channelTitle": user_channel["title"],
+            "avatar": "",
+            "analyzedNiche": f"{user_channel['topic'].title()} documentaries",
+            "analyzedStyle": "Documentary",
+            "analyzedAttentionMarket": "Young Adults, M, [Entertainment]",
+            "competitorLists": [{
+                "listId": list_id,
+                "name": "Bench",
+                "createdAt": datetime.now(timezone.utc),
+                "competitors": [],
+            }, {
+                "listId": scratch_list_id,
+                "name": "Bench Scratch",
+                "createdAt": datetime.now(timezone.utc),
+                "competitors": [],
+            }],
+        }],
+        "savedCollections": [
+            {"collectionId": "bench-collection", "name": "Bench", "videos": [_collection_video(CHANNELS[1], 0)]},
+            {"collectionId": "bench-scratch", "name": "Bench Scratch", "videos": []},
+        ],
+    }).inserted_id
+
+    # check_competitors_for_all_users reads these collections
+    mongo.db.competitor_lists.insert_one({"listId": list_id, "channelId": user_channel["id"]})
+    mongo.db.competitors.insert_many([
+        {"listId": list_id, "competitorChannelId": ch["id"], "title": ch["title"]}
+        for ch in CHANNELS[20:60]
+    ])
+
+    return str(user_id), user_channel["id"], competitor["id"], str(list_id), str(scratch_list_id)
+
+def _collection_video(channel, n):
+    return {
+        "videoId": channel["videoIds"][n],
+        "title": f"{channel['title']} video {n}",
+        "thumbnail": "",
+        "length": "10:00",
+        "channelTitle": channel["title"],
+        "channelId": channel["id"],
+        "viewCount": 1000,
+        "publishedAt": "2024-01-01T00:00:00Z",
+    }
+
+def build_operations(ctx):
+    ch, comp, list_id = ctx["channel_id"], ctx["competitor_id"], ctx["list_id"]
+    other = CHANNELS[1]["id"]
+    new_channel = CHANNELS[2]["id"]
+    saved_video, new_video = _collection_video(CHANNELS[1], 0), _collection_video(CHANNELS[1], 1)
+    lists = f"/api/competitor-tracker/lists/{ch}"
+
+    # Deleted each iteration and recreated by the teardown, which gets a new ID
+    scratch = {"collection": "bench-scratch", "list": ctx["scratch_list_id"]}
+
+    def recreate(kind, method, path, body, id_field):
+        def teardown(call, resp):
+            created = call(method, path, body).get_json() or {}
+            if id_field in created:
+                scratch[kind] = created[id_field]
+        return teardown
+
+    def delete_created(path_for):
+        def teardown(call, resp):
+            created = resp.get_json() or {}
+            if resp.status_code < 400:
+                call(*path_for(created))
+        return teardown
+
+    return [
+        # name, method, path (or a callable returning it), json body,
+        # teardown: (method, path, body) or a callable taking (call, response)
+        ("auth.login", "POST", "/api/auth/login", {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}, None),
+        ("auth.me", "GET", "/api/auth/me", None, None),
+        ("auth.refresh_token", "POST", "/api/auth/refresh-token", None, None),
+        ("auth.logout", "POST", "/api/auth/logout", None, None),
+        ("settings.get", "GET", "/api/settings/get", None, None),
+        ("settings.update_notifications", "POST", "/api/settings/update/notifications", {"enabled": True}, None),
+        ("channel.search", "GET", "/api/channel/search?q=history", None, None),
+        ("channel.list", "GET", "/api/channel/list", None, None),
+        ("channel.add", "POST", "/api/channel/add", {"channelId": new_channel},
+            ("POST", "/api/channel/remove", {"channelId": new_channel})),
+        ("channel.metadata", "GET", f"/api/channel/{other}/metadata", None, None),
+        ("channel.stats", "GET", f"/api/channel/{other}/stats", None, None),
+        ("channel.videos", "POST", f"/api/channel/{other}/videos", {"contentType": "longform"}, None),
+        ("channel.insights", "POST", f"/api/channel/{other}/insights", {"my_channel_id": ch}, None),
+        ("collections.list", "GET", "/api/collections/list", None, None),
+        ("collections.videos", "GET", "/api/collections/bench-collection/videos", None, None),
+        ("collections.create", "POST", "/api/collections/create", {"name": "Bench New"},
+            delete_created(lambda c: ("DELETE", f"/api/collections/{c['collectionId']}", None))),
+        ("collections.rename", "POST", "/api/collections/bench-collection/rename", {"name": "Bench Renamed"},
+            ("POST", "/api/collections/bench-collection/rename", {"name": "Bench"})),
+        ("collections.add_video", "POST", "/api/collections/bench-collection/videos", {"video": new_video},
+            ("DELETE", f"/api/collections/bench-collection/videos/{new_video['videoId']}", None)),
+        ("collections.remove_video", "DELETE", f"/api/collections/bench-collection/videos/{saved_video['videoId']}", None,
+            ("POST", "/api/collections/bench-collection/videos", {"video": saved_video})),
+        ("collections.delete", "DELETE", lambda: f"/api/collections/{scratch['collection']}", None,
+            recreate("collection", "POST", "/api/collections/create", {"name": "Bench Scratch"}, "collectionId")),
+        ("niche_explorer.search", "POST", "/api/niche-explorer/search", NICHE_QUERY, None),
+        ("competitor_tracker.lists", "GET", lists, None, None),
+        ("competitor_tracker.create_list", "POST", f"{lists}/create", {"name": "Bench New"},
+            delete_created(lambda c: ("POST", f"{lists}/{c['listId']}/delete", None))),
+        ("competitor_tracker.rename_list", "POST", f"{lists}/{list_id}/rename", {"name": "Bench Renamed"},
+            ("POST", f"{lists}/{list_id}/rename", {"name": "Bench"})),
+        ("competitor_tracker.delete_list", "POST", lambda: f"{lists}/{scratch['list']}/delete", None,
+            recreate("list", "POST", f"{lists}/create", {"name": "Bench Scratch"}, "listId")),
+        ("competitor_tracker.competitors", "GET", f"/api/competitor-tracker/competitors/{ch}/{list_id}", None, None),
+        ("competitor_tracker.add", "POST", f"/api/competitor-tracker/competitors/{ch}/{list_id}/add",
+            {"competitorChannelId": comp},
+            ("POST", f"/api/competitor-tracker/competitors/{ch}/{list_id}/remove", {"competitor_channel_id": comp})),
+        ("generators.title", "POST", "/api/generators/title", {"idea": "The forgotten war that shaped Europe", "channelId": ch}, None),
+        ("generators.title_stream", "POST", "/api/generators/title/stream", {"idea": "The forgotten war that shaped Europe", "channelId": ch}, None),
+        ("notifications.list", "GET", f"/api/notifications/list?channelId={ch}", None, None),
+        ("notifications.mark_read", "POST", "/api/notifications/mark-read", {"channelId": ch}, None),
+        ("outliers.list", "GET", f"/api/outliers/list?channelId={ch}", None, None),
+        ("admin.metrics_youtube", "GET", "/api/admin/metrics/youtube", None, None),
+        ("admin.metrics_llm", "GET", "/api/admin/metrics/llm", None, None),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamline end-to-end benchmark")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--youtube-latency-ms", type=float, default=80)
+    parser.add_argument("--openai-latency-ms", type=float, default=400)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/streamline_bench")
+    parser.add_argument("--redis-uri", default="redis://localhost:6379/15")
+    parser.add_argument("--embedding-backend", choices=["openai", "local"], default="openai",
+                        help="openai goes through the stand-in; local embeds in-process")
+    parser.add_argument("--cold", action="store_true", help="flush caches before every iteration")
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args()
+
+    start_standin(args.port, args.youtube_latency_ms, args.openai_latency_ms)
+    standin_url = configure_env(args)
+
+    from app import app, scheduler
+    from extensions import limiter, mongo
+    from utils.security import generate_tokens, generate_csrf_token
+    from utils.scheduled_jobs import refresh_all_outliers_for_all_users, check_competitors_for_all_users, preanalyze_competitors
+    from utils.channel_catalog import rebuild_catalog_index
+
+    scheduler.pause()
+    limiter.enabled = False
+    redis = app.extensions["redis"]
+
+    with app.app_context():
+        user_id, channel_id, competitor_id, list_id, scratch_list_id = seed(app, mongo, redis)
+        access_token, refresh_token = generate_tokens(BENCH_EMAIL, user_id)
+    csrf_token = generate_csrf_token()
+
+    client = app.test_client(use_cookies=False)
+    auth_headers = {
+        "Cookie": f"token={access_token}; refresh_token={refresh_token}; csrf_token={csrf_token}",
+        "X-CSRF-Token": csrf_token,
+    }
+
+    def standin(path, method="GET"):
+        return requests.request(method, f"{standin_url}{path}", timeout=10).json()
+
+    def call(method, path, body):
+        resp = client.open(path, method=method, json=body, headers=auth_headers)
+        # Streamed responses only run as their body is read
+        resp.get_data()
+        # Accepted jobs are timed until they finish
+        if resp.status_code == 202 and resp.headers.get("Location"):
+            deadline = time.perf_counter() + 60
+            while time.perf_counter() < deadline:
+                time.sleep(0.01)
+                status = client.get(resp.headers["Location"], headers=auth_headers)
+                if status.get_json().get("status") in ("done", "failed"):
+                    return status
+        return resp
+
+    def run_job(func):
+        with app.app_context():
+            func()
+
+    operations = [
+        (name, lambda m=method, p=path, b=body: call(m, p() if callable(p) else p, b), teardown)
+        for name, method, path, body, teardown in build_operations({
+            "channel_id": channel_id, "competitor_id": competitor_id, "list_id": list_id,
+            "scratch_list_id": scratch_list_id,
+        })
+    ] + [
+        ("job.refresh_all_outliers_for_all_users", lambda: run_job(refresh_all_outliers_for_all_users), None),
+        ("job.check_competitors_for_all_users", lambda: run_job(check_competitors_for_all_users), None),
+        ("job.preanalyze_competitors", lambda: run_job(preanalyze_competitors), None),
+        ("job.rebuild_catalog_index", lambda: run_job(rebuild_catalog_index), None),
+        # Same query again, now answerable from the channel catalog index
+        ("niche_explorer.search (catalog)", lambda: call("POST", "/api/niche-explorer/search", NICHE_QUERY), None),
+    ]
+
+    results = {}
+    for name, op, teardown in operations:
+        samples = {"latency_ms": [], "youtube_calls": [], "openai_calls": [], "quota_units": [], "http_requests": []}
+        statuses = set()
+
+        for _ in range(args.iterations):
+            if args.cold:
+                redis.flushdb()
+                mongo.db.channel_uploads.delete_many({})
+                mongo.db.uploads_playlists.delete_many({})
+
+            standin("/_reset", "POST")
+            started = time.perf_counter()
+            resp = op()
+            samples["latency_ms"].append((time.perf_counter() - started) * 1000)
+            if resp is not None:
+                statuses.add(resp.status_code)
+
+            stats = standin("/_stats")
+            calls = stats["calls"]
+            samples["youtube_calls"].append(sum(v for k, v in calls.items() if k.startswith("youtube.")))
+            samples["openai_calls"].append(sum(v for k, v in calls.items() if k.startswith("openai.")))
+            samples["quota_units"].append(stats["units"])
+            samples["http_requests"].append(stats["httpRequests"])
+
+            if callable(teardown):
+                teardown(call, resp)
+            elif teardown:
+                call(*teardown)
+
+        results[name] = {
+            "p50_ms": round(_percentile(samples["latency_ms"], 50), 1),
+            "p95_ms": round(_percentile(samples["latency_ms"], 95), 1),
+            "youtube_calls": median(samples["youtube_calls"]),
+            "http_requests": median(samples["http_requests"]),
+            "quota_units": median(samples["quota_units"]),
+            "openai_calls": median(samples["openai_calls"]),
+            "statuses": sorted(statuses),
+        }
+
+    header = f"{'operation':<42}{'p50 ms':>10}{'p95 ms':>10}{'yt calls':>10}{'http':>8}{'units':>8}{'openai':>8}  status"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<42}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['youtube_calls']:>10}"
+            f"{r['http_requests']:>8}{r['quota_units']:>8}{r['openai_calls']:>8}  {r['statuses'] or '-'}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""
+Offline stand-in for the YouTube Data API and the OpenAI endpoints Streamline uses.
+
+Serves deterministic synthetic data for search, channels, playlistItems and videos
+(including multipart batch requests and ETag revalidation), plus OpenAI
+embeddings.create and chat.completions.create, with configurable latency.
+Call counts and quota units are exposed on /_stats and cleared with /_reset.
+
+Run standalone:
+    python -m bench.standin --port 8090 --youtube-latency-ms 80 --openai-latency-ms 400
+and point the backend at it:
+    GOOGLE_YT_API_ENDPOINT=http://127.0.0.1:8090/
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1
+"""
+from flask import Flask, request, jsonify, Response
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import argparse, base64, hashlib, json, random, re, threading, time
+
+CHANNEL_COUNT = 300
+VIDEOS_PER_CHANNEL = 120
+EMBEDDING_DIMENSIONS = 1536
+
+QUOTA_COSTS = {"search": 100, "channels": 1, "playlistItems": 1, "videos": 1}
+
+TOPICS = [
+    "history", "minecraft", "valorant", "cooking", "finance", "true crime", "space",
+    "fitness", "chess", "woodworking", "anime", "football", "travel", "science",
+    "horror stories", "car reviews", "productivity", "photography", "guitar", "survival",
+]
+TITLE_TEMPLATES = [
+    "The Untold Story of {t}", "How {t} Changed Everything", "I Tried {t} for 30 Days",
+    "The Most Dangerous Moment in {t}", "Why Nobody Talks About {t}", "{t} Explained in 10 Minutes",
+    "The Rise and Fall of {t}", "Beginner's Guide to {t}", "What Happened to {t}?",
+    "The Secret History of {t}", "Ranking Every {t} Moment", "{t}: The Full Documentary",
+]
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+def _rng(*parts):
+    return random.Random(hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest())
+
+def _b64id(seed, length):
+    return base64.urlsafe_b64encode(hashlib.sha1(seed.encode()).digest()).decode()[:length]
+
+def _iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+# --- Synthetic catalog ---
+
+CHANNELS = []
+CHANNEL_INDEX = {}
+VIDEO_INDEX = {}
+
+def _build_catalog():
+    for i in range(CHANNEL_COUNT):
+        rng = _rng("channel", i)
+        topic = TOPICS[i % len(TOPICS)]
+        channel_id = "UC" + _b64id(f"channel-{i}", 22)
+        subscribers = int(10 ** rng.uniform(3, 6.5))
+        channel = {
+            "id": channel_id,
+            "index": i,
+            "topic": topic,
+            "title": f"{topic.title()} {rng.choice(['Daily', 'Lab', 'Archive', 'Hub', 'Files', 'Explained'])} {i}",
+            "subscribers": subscribers,
+            "uploadInterval": rng.uniform(0.5, 7.0),
+            "videoIds": [_b64id(f"video-{i}-{n}", 11) for n in range(VIDEOS_PER_CHANNEL)],
+        }
+        CHANNELS.append(channel)
+        CHANNEL_INDEX[channel_id] = channel
+        for n, vid in enumerate(channel["videoIds"]):
+            VIDEO_INDEX[vid] = (channel, n)
+
+_build_catalog()
+
+def _video(vid):
+    channel, n = VIDEO_INDEX[vid]
+    rng = _rng("video", vid)
+    published = NOW - timedelta(days=n * channel["uploadInterval"] + rng.random())
+    seconds = rng.choice([rng.randint(20, 60), rng.randint(240, 2400), rng.randint(2400, 7200)])
+    views = int(channel["subscribers"] * rng.lognormvariate(-1.5, 1.0))
+    if rng.random() < 0.05:
+        views *= rng.randint(3, 20)  # occasional outlier
+    title = rng.choice(TITLE_TEMPLATES).format(t=channel["topic"].title())
+    return {
+        "kind": "youtube#video",
+        "etag": _b64id(f"etag-{vid}", 27),
+        "id": vid,
+        "snippet": {
+            "publishedAt": _iso(published),
+            "channelId": channel["id"],
+            "title": title,
+            "description": f"A video about {channel['topic']}. " * 8,
+            "thumbnails": {
+                "default": {"url": f"https://i.ytimg.com/vi/{vid}/default.jpg"},
+                "high": {"url": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"},
+            },
+            "channelTitle": channel["title"],
+            "tags": [channel["topic"], "streamline", "benchmark"],
+        },
+        "contentDetails": {"duration": f"PT{seconds // 60}M{seconds % 60}S"},
+        "statistics": {"viewCount": str(views), "likeCount": str(views // 30)},
+    }
+
+def _channel(channel):
+    return {
+        "kind": "youtube#channel",
+        "etag": _b64id(f"etag-{channel['id']}", 27),
+        "id": channel["id"],
+        "snippet": {
+            "title": channel["title"],
+            "description": f"The best {channel['topic']} content on YouTube.",
+            "customUrl": f"@{channel['title'].replace(' ', '').lower()}",
+            "thumbnails": {"default": {"url": f"http://yt3.ggpht.com/{channel['id']}.jpg"}},
+        },
+        "statistics": {
+            "subscriberCount": str(channel["subscribers"]),
+            "viewCount": str(channel["subscribers"] * 40),
+            "videoCount": str(VIDEOS_PER_CHANNEL),
+        },
+        "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel["id"][2:]}},
+    }
+
+def _error(status, reason, message):
+    return status, {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+# --- YouTube handlers: (params, headers) -> (status, body) ---
+
+def _search(params, headers):
+    q = params.get("q", "")
+    max_results = min(int(params.get("maxResults", 5)), 50)
+    rng = _rng("search", q, params.get("type"), params.get("videoDuration"), params.get("publishedAfter"))
+    words = set(q.lower().split())
+    matching = [c for c in CHANNELS if words & set(c["topic"].split())] or CHANNELS
+    pool = matching * 3 + rng.sample(CHANNELS, 20)
+
+    if params.get("type") == "channel":
+        picked = list(dict.fromkeys(c["id"] for c in rng.sample(pool, min(len(pool), max_results * 2))))[:max_results]
+        return 200, {"items": [{"id": {"kind": "youtube#channel", "channelId": cid}} for cid in picked]}
+
+    items = []
+    seen = set()
+    while len(items) < max_results:
+        channel = rng.choice(pool)
+        vid = channel["videoIds"][rng.randint(0, 20)]
+        if vid in seen:
+            continue
+        seen.add(vid)
+        video = _video(vid)
+        items.append({
+            "id": {"kind": "youtube#video", "videoId": vid},
+            "snippet": {k: video["snippet"][k] for k in ("publishedAt", "channelId", "title", "channelTitle")},
+        })
+    return 200, {"items": items}
+
+def _channels(params, headers):
+    ids = [i for i in params.get("id", "").split(",") if i]
+    etag = _b64id(f"channels:{','.join(ids)}", 27)
+    if headers.get("if-none-match") == etag:
+        return 304, None
+    return 200, {"etag": etag, "items": [_channel(CHANNEL_INDEX[i]) for i in ids if i in CHANNEL_INDEX]}
+
+def _playlist_items(params, headers):
+    playlist_id = params.get("playlistId", "")
+    channel = CHANNEL_INDEX.get("UC" + playlist_id[2:]) if playlist_id.startswith("UU") else None
+    if not channel:
+        return _error(404, "playlistNotFound", "The playlist identified with the request's playlistId parameter cannot be found.")
+
+    offset = int(params.get("pageToken") or 0)
+    max_results = min(int(params.get("maxResults", 5)), 50)
+    page_ids = channel["videoIds"][offset:offset + max_results]
+
+    etag = _b64id(f"{playlist_id}:{offset}:{max_results}:{','.join(page_ids)}", 27)
+    if headers.get("if-none-match") == etag:
+        return 304, None
+
+    body = {
+        "etag": etag,
+        "items": [{
+            "snippet": {"title": _video(vid)["snippet"]["title"], "publishedAt": _video(vid)["snippet"]["publishedAt"]},
+            "contentDetails": {"videoId": vid, "videoPublishedAt": _video(vid)["snippet"]["publishedAt"]},
+        } for vid in page_ids],
+    }
+    if offset + max_results < len(channel["videoIds"]):
+        body["nextPageToken"] = str(offset + max_results)
+    return 200, body
+
+def _videos(params, headers):
+    ids = [i for i in params.get("id", "").split(",") if i]
+    return 200, {"items": [_video(i) for i in ids if i in VIDEO_INDEX]}
+
+YOUTUBE_HANDLERS = {
+    "search": _search,
+    "channels": _channels,
+    "playlistItems": _playlist_items,
+    "videos": _videos,
+}
+
+# --- Fake OpenAI ---
+
+@lru_cache(maxsize=50000)
+def _token_vector(token, dimensions):
+    seed = int(hashlib.sha1(token.encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+def fake_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    tokens = re.findall(r"\w+", text.lower()) or [""]
+    vec = np.sum([_token_vector(t, dimensions) for t in tokens], axis=0)
+    norm = np.linalg.norm(vec)
+    return (vec / norm if norm else vec).tolist()
+
+def _fake_insights(rng):
+    return {
+        "niche": f"{rng.choice(TOPICS).title()} videos",
+        "style": rng.choice(["Documentary", "Commentary", "Gameplay", "Educational"]),
+        "attention_market": rng.choice([
+            "Young Adults, M, [Entertainment]",
+            "Mixed Ages, Mix, [Education, Entertainment]",
+            "Teens, M, [Entertainment]",
+        ]),
+    }
+
+def _fake_completion(messages):
+    prompt = " ".join(m.get("content", "") for m in messages if isinstance(m.get("content"), str))
+    # Batched classification: one result per "### Channel <n>" section
+    sections = re.split(r"### Channel (\d+)", prompt)
+    if len(sections) > 1:
+        return json.dumps({"results": [
+            {"channel": int(number), **_fake_insights(_rng("chat", text[-2000:]))}
+            for number, text in zip(sections[1::2], sections[2::2])
+        ]})
+    rng = _rng("chat", prompt[-2000:])
+    if "titles" in prompt.lower() and "json array" in prompt.lower():
+        topic = rng.choice(TOPICS).title()
+        return json.dumps([rng.choice(TITLE_TEMPLATES).format(t=topic) + f" #{i + 1}" for i in range(10)])
+    return json.dumps(_fake_insights(rng))
+
+def _usage(prompt_tokens, completion_tokens, cached_tokens=0):
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+# --- Server ---
+
+def create_standin_app(youtube_latency_ms=0, openai_latency_ms=0):
+    app = Flask("standin")
+    lock = threading.Lock()
+    stats = {"calls": {}, "units": 0, "httpRequests": 0}
+    # Rough prefix caching: a leading system message seen before counts as cached,
+    # if it is at least the provider's 1024-token minimum (tokens ~ words here)
+    seen_prefixes = set()
+
+    def count(name, units=0):
+        with lock:
+            stats["calls"][name] = stats["calls"].get(name, 0) + 1
+            stats["units"] += units
+
+    def count_http():
+        with lock:
+            stats["httpRequests"] += 1
+
+    def dispatch_youtube(resource, params, headers):
+        handler = YOUTUBE_HANDLERS.get(resource)
+        if not handler:
+            return _error(404, "notFound", f"Unknown resource {resource}")
+        count(f"youtube.{resource}.list", QUOTA_COSTS.get(resource, 1))
+        return handler(params, headers)
+
+    @app.get("/youtube/v3/<resource>")
+    @app.get("/<resource>")
+    def youtube(resource):
+        count_http()
+        time.sleep(youtube_latency_ms / 1000)
+        params = {k: v for k, v in request.args.items()}
+        headers = {k.lower(): v for k, v in request.headers.items()}
+        status, body = dispatch_youtube(resource, params, headers)
+        if status == 304:
+            return Response(status=304)
+        return jsonify(body), status
+
+    @app.post("/batch")
+    @app.post("/batch/youtube/v3")
+    def batch():
+        count_http()
+        time.sleep(youtube_latency_ms / 1000)
+        content_type = request.headers["Content-Type"]
+        msg = message_from_bytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + request.get_data())
+
+        boundary = "standin_batch_boundary"
+        out = []
+        for part in msg.get_payload():
+            lines = part.get_payload().replace("\r\n", "\n").split("\n")
+            method, path, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if not line.strip():
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            url = urlsplit(path)
+            resource = url.path.rstrip("/").split("/")[-1]
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, body = dispatch_youtube(resource, params, headers)
+
+            reason = {200: "OK", 304: "Not Modified", 404: "Not Found"}.get(status, "Error")
+            content_id = part["Content-ID"].strip("<>")
+            payload = "" if status == 304 else json.dumps(body)
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return Response("".join(out), content_type=f"multipart/mixed; boundary={boundary}")
+
+    @app.post("/v1/embeddings")
+    def embeddings():
+        count_http()
+        count("openai.embeddings.create")
+        time.sleep(openai_latency_ms / 1000)
+        body = request.get_json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS
+        tokens = sum(len(str(t).split()) for t in inputs)
+        return jsonify({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(t), dimensions)}
+                for i, t in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    @app.post("/v1/chat/completions")
+    def chat_completions():
+        count_http()
+        count("openai.chat.completions.create")
+        time.sleep(openai_latency_ms / 1000)
+        body = request.get_json()
+        content = _fake_completion(body.get("messages", []))
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        cached_tokens = 0
+        if messages and messages[0].get("role") == "system":
+            prefix = str(messages[0].get("content", ""))
+            with lock:
+                if prefix in seen_prefixes and len(prefix.split()) >= 1024:
+                    cached_tokens = len(prefix.split())
+                seen_prefixes.add(prefix)
+        completion_tokens = len(content.split())
+        base = {"id": "chatcmpl-standin", "created": int(time.time()), "model": body.get("model")}
+
+        if not body.get("stream"):
+            return jsonify({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(prompt_tokens, completion_tokens, cached_tokens),
+            })
+
+        def stream():
+            for i in range(0, len(content), 12):
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + 12]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                time.sleep(0.005)
+            final = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final["usage"] = _usage(prompt_tokens, completion_tokens, cached_tokens)
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return Response(stream(), content_type="text/event-stream")
+
+    @app.get("/_stats")
+    def get_stats():
+        with lock:
+            return jsonify(json.loads(json.dumps(stats)))
+
+    @app.post("/_reset")
+    def reset_stats():
+        with lock:
+            stats.update({"calls": {}, "units": 0, "httpRequests": 0})
+        return jsonify({"ok": True})
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline YouTube/OpenAI stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--youtube-latency-ms", type=float, default=80)
+    parser.add_argument("--openai-latency-ms", type=float, default=400)
+    args = parser.parse_args()
+
+    create_standin_app(args.youtube_latency_ms, args.openai_latency_ms).run(
+        host=args.host, port=args.port, threaded=True
+    )
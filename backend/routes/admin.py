@@ -0,0 +1,71 @@
+from flask import Blueprint, request, jsonify, current_app
+from utils.security import admin_required
+from utils.quota import get_quota_usage, quota_day, DEFAULT_DAILY_QUOTA
+from utils.usage import get_usage, get_llm_usage
+from extensions import limiter
+import re
+
+admin_bp = Blueprint("admin", __name__)
+
+def _valid_day(day):
+    return re.fullmatch(r"\d{4}-\d{2}-\d{2}", day)
+
+@admin_bp.route("/metrics/youtube", methods=["GET"])
+@admin_required
+@limiter.limit("30 per minute")
+def youtube_metrics(data):
+    day = request.args.get("day") or quota_day()
+    if not _valid_day(day):
+        return jsonify({"error": "day must be YYYY-MM-DD"}), 400
+
+    try:
+        redis = current_app.extensions["redis"]
+        callers = get_usage(redis, day)
+
+        response = {
+            "day": day,
+            "totalUnits": sum(c["units"] for c in callers.values()),
+            "totalCalls": sum(c["calls"] for c in callers.values()),
+            "callers": callers,
+        }
+        # The per-key ledger only covers the current quota day
+        if day == quota_day():
+            response["keys"] = get_quota_usage(
+                redis,
+                current_app.config["YT_API_KEYS"],
+                current_app.config.get("YT_DAILY_QUOTA", DEFAULT_DAILY_QUOTA)
+            )
+
+        return jsonify(response)
+
+    except Exception as e:
+        current_app.logger.error(f"Failed to load YouTube metrics for {data['email']}: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@admin_bp.route("/metrics/llm", methods=["GET"])
+@admin_required
+@limiter.limit("30 per minute")
+def llm_metrics(data):
+    day = request.args.get("day") or quota_day()
+    if not _valid_day(day):
+        return jsonify({"error": "day must be YYYY-MM-DD"}), 400
+
+    try:
+        callers = get_llm_usage(current_app.extensions["redis"], day)
+        prompt_tokens = sum(c["promptTokens"] for c in callers.values())
+        cached_tokens = sum(c["cachedTokens"] for c in callers.values())
+
+        return jsonify({
+            "day": day,
+            "totalCalls": sum(c["calls"] for c in callers.values()),
+            "totalPromptTokens": prompt_tokens,
+            "totalCachedTokens": cached_tokens,
+            "totalCompletionTokens": sum(c["completionTokens"] for c in callers.values()),
+            "cacheHitRate": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0,
+            "callers": callers,
+        })
+
+    except Exception as e:
+        current_app.logger.error(f"Failed to load LLM metrics for {data['email']}: {e}")
+        return jsonify({"error": "Internal server error"}), 500
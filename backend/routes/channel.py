@@ -1,19 +1,27 @@
 from utils.channel import compute_outlier_scores, analyze_channel_insights
 from flask import Blueprint, request, jsonify, current_app
-from utils.embeddings import embed_text, cosine_similarity
+from utils.embeddings import cosine_similarity
+from utils.profile_embeddings import embed_profile, delete_profile_embeddings
 from utils.parser import parse_channel_metadata, extract_main_topic, parse_motives
 from utils.security import auth_and_csrf_required
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
-from utils.youtube_api import get_youtube_client, fetch_channel_videos
+from utils.youtube_api import get_youtube_client, fetch_channel_metadata, execute_conditional, CHANNEL_METADATA_FIELDS
+from utils.uploads_store import fetch_uploads
+from utils.video_cache import parse_timestamp, with_time_ago
 from statistics import median
-from utils.db import get_redis_cache, set_redis_cache
-from dateutil import parser as date_parser
+from utils.db import get_redis_cache, set_redis_cache, get_or_set_redis_cache
 from utils.scheduled_jobs import find_outliers_for_channel
+from utils.title_context import build_title_context
+from utils.usage import tracked
+from utils.jobs import create_job, update_job, get_job
 from extensions import limiter, mongo, executor
 
 channel_bp = Blueprint("channel", __name__)
 
+# parse_channel_metadata fields plus the handle
+ADD_CHANNEL_FIELDS = f"{CHANNEL_METADATA_FIELDS},items/snippet/customUrl"
+
 @channel_bp.route("/<channel_id>/stats", methods=["GET"])
 @auth_and_csrf_required
 @limiter.limit("60 per minute")
@@ -22,38 +30,29 @@ def get_channel_stats(data, channel_id):
     if not channel_id or not channel_id.startswith("UC"):
         return jsonify({"error": "Invalid channelId"}), 400
 
-    try:
+    def build_stats():
         now = datetime.now(timezone.utc)
-
-        # Serve from cache if available
-        redis_key = f"channel_stats:{channel_id}"
-        cached = get_redis_cache(redis, redis_key)
-
-        if cached:
-            return jsonify(cached)
-
         yt = get_youtube_client()
 
-        # Get channel metadata and uploads playlist
-        chan_info = yt.channels().list(part="statistics,contentDetails,snippet", id=channel_id).execute()
+        # Get channel statistics
+        chan_info = execute_conditional(yt.channels().list(
+            part="statistics", id=channel_id, fields="etag,items(id,statistics/subscriberCount)"
+        ))
         chan_items = chan_info.get("items", [])
         if not chan_items:
-            return jsonify({"error": "Channel not found"}), 404
+            return None
 
         stats = chan_items[0].get("statistics", {})
         total_subs = int(stats.get("subscriberCount", 0)) if stats.get("subscriberCount") else 0
-        uploads_id = chan_items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
 
-        # Fetch up to 50 recent videos using helper
-        videos_res = fetch_channel_videos(yt, uploads_id, max_videos=50)
+        # Fetch up to 50 recent videos from the upload store
+        videos_res = fetch_uploads(yt, channel_id, max_videos=50)
         videos = videos_res["videos"]
 
         # Uploads in last 30 days
         last_30_days = now - timedelta(days=30)
-        uploads_last_30d = sum(
-            1 for video in videos
-            if date_parser.parse(video["publishedAt"]).replace(tzinfo=timezone.utc) >= last_30_days
-        )
+        published = (parse_timestamp(video["publishedAt"]) for video in videos)
+        uploads_last_30d = sum(1 for p in published if p and p >= last_30_days)
 
         # Compute median views and outlier scores for last 10 uploads
         recent_10 = videos[:10]
@@ -86,8 +85,7 @@ def get_channel_stats(data, channel_id):
                     "isShort": is_short
                 })
 
-        # Final response
-        stats_response = {
+        return {
             "uploadsLast30d": uploads_last_30d,
             "medianViewsRecent10": median_views,
             "totalSubscribers": total_subs,
@@ -95,8 +93,13 @@ def get_channel_stats(data, channel_id):
             "recentVideos": recent_videos,
         }
 
-        # Cache and return
-        set_redis_cache(redis, redis_key, stats_response, ttl_seconds=3600)
+    try:
+        # Serve from cache, or let one worker build it while the others wait
+        redis_key = f"channel_stats:{channel_id}"
+        stats_response = get_or_set_redis_cache(redis, redis_key, build_stats, ttl_seconds=3600)
+
+        if stats_response is None:
+            return jsonify({"error": "Channel not found"}), 404
 
         return jsonify(stats_response)
 
@@ -122,14 +125,16 @@ def search_channels(data):
             q=query,
             type="channel",
             part="snippet",
-            maxResults=25
+            maxResults=25,
+            fields="items/id/channelId"
         ).execute()
 
         channel_ids = [item["id"]["channelId"] for item in res.get("items", [])]
 
         chan_info = yt.channels().list(
             part="snippet,statistics",
-            id=",".join(channel_ids)
+            id=",".join(channel_ids),
+            fields="items(id,snippet(title,description,thumbnails/default/url),statistics/subscriberCount)"
         ).execute()
 
         results = []
@@ -190,10 +195,19 @@ def list_user_channels(data):
         current_app.logger.error(f"Failed to list channels for user {data['email']}: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+ADD_CHANNEL_PENDING_SECONDS = 10 * 60
+
+def _pending_add_key(user_id, channel_id):
+    return f"add_channel_pending:{user_id}:{channel_id}"
+
 @channel_bp.route("/add", methods=["POST"])
 @auth_and_csrf_required
 @limiter.limit("5 per minute")
 def add_channel(data):
+    """
+    Validate the request and queue the channel's fetch, analysis and save.
+    Returns 202 with a job ID; poll GET /add/<job_id> for the saved channel.
+    """
     body = request.get_json()
     channel_id = body.get("channelId")
 
@@ -201,68 +215,126 @@ def add_channel(data):
         return jsonify({"error": "Missing or invalid channelId"}), 400
 
     try:
-        user_id = ObjectId(data["user_id"])
-        user_email = data["email"]
-        users = mongo.db.users
-
-        existing = users.find_one({"_id": user_id, "channels.channelId": channel_id})
+        user_id = data["user_id"]
+        existing = mongo.db.users.find_one({"_id": ObjectId(user_id), "channels.channelId": channel_id})
         if existing:
             return jsonify({"error": "Channel already added"}), 400
 
-        yt = get_youtube_client()
-        chan_info = yt.channels().list(
-            part="snippet,statistics,contentDetails",
-            id=channel_id
-        ).execute()
-
-        if not chan_info["items"]:
-            return jsonify({"error": "Channel metadata not found"}), 404
-
-        meta = parse_channel_metadata(chan_info)
-        uploads_id = meta["uploadsId"]
+        # Adding the same channel again while it's being analysed returns the same job
+        redis = current_app.extensions["redis"]
+        pending_key = _pending_add_key(user_id, channel_id)
+        job_id = create_job("add_channel", user_id, channelId=channel_id)
+        if redis.set(pending_key, job_id, nx=True, ex=ADD_CHANNEL_PENDING_SECONDS):
+            app = current_app._get_current_object()
+            executor.submit(_run_add_channel, app, job_id, user_id, data["email"], channel_id)
+        else:
+            # Lost the claim to a concurrent request; the unused job just expires
+            job_id = redis.get(pending_key) or job_id
+
+        response = jsonify({"jobId": job_id, "status": "queued"})
+        response.headers["Location"] = f"{request.path}/{job_id}"
+        return response, 202
 
-        videos_res = fetch_channel_videos(yt, uploads_id, 20)
-        videos = videos_res.get("videos", [])
+    except Exception as e:
+        current_app.logger.error(f"Failed to add channel for user {data['email']}: {str(e)}")
+        return jsonify({"error": f"Failed to add channel: {str(e)}"}), 500
 
-        insights = analyze_channel_insights(meta["description"], videos)
+@tracked("add_channel")
+def _run_add_channel(app, job_id, user_id, user_email, channel_id):
+    with app.app_context():
+        try:
+            user_channel, error = _add_channel_pipeline(job_id, user_id, channel_id)
+            if error:
+                update_job(job_id, status="failed", step=None, error=error)
+                return
+            update_job(job_id, status="done", step=None, result=user_channel)
+        except Exception as e:
+            app.logger.error(f"Failed to add channel {channel_id} for user {user_email}: {str(e)}")
+            update_job(job_id, status="failed", step=None, error=f"Failed to add channel: {str(e)}")
+            return
+        finally:
+            app.extensions["redis"].delete(_pending_add_key(user_id, channel_id))
+
+        # Follow-up work runs as separate tasks so a slow step doesn't hold the pool
+        _submit_follow_up(app, "embed_profile", user_email, channel_id, embed_profile, user_id, user_channel)
+        _submit_follow_up(app, "build_title_context", user_email, channel_id,
+                          lambda: build_title_context(get_youtube_client(), channel_id))
+        _submit_follow_up(app, "find_outliers_for_channel", user_email, channel_id,
+                          find_outliers_for_channel, user_id, user_email, user_channel)
+
+def _submit_follow_up(app, name, user_email, channel_id, func, *args):
+    @tracked(name)
+    def run():
+        with app.app_context():
+            try:
+                func(*args)
+            except Exception as e:
+                app.logger.error(f"[{user_email}] Error in {name} after adding channel {channel_id}: {e}")
+
+    executor.submit(run)
+
+def _add_channel_pipeline(job_id, user_id, channel_id):
+    """
+    Fetch, analyse and save a channel. Returns (user_channel, None) or (None, error).
+    """
+    update_job(job_id, status="running", step="fetching")
+    yt = get_youtube_client()
+    chan_info = execute_conditional(yt.channels().list(
+        part="snippet,statistics,contentDetails",
+        id=channel_id,
+        fields=ADD_CHANNEL_FIELDS
+    ))
 
-        if not insights or insights.get("format") == "Unknown":
-            return jsonify({"error": "Could not analyze channel — no videos or unknown format"}), 400
+    if not chan_info.get("items"):
+        return None, "Channel metadata not found"
 
-        handle = chan_info["items"][0]["snippet"].get("customUrl") or f"channel/{channel_id}"
+    meta = parse_channel_metadata(chan_info)
 
-        user_channel = {
-            "handle": handle,
-            "channelId": meta["channelId"],
-            "channelTitle": meta["channelTitle"],
-            "avatar": meta["avatar"],
-            "analyzedNiche": insights["analyzedNiche"],
-            "analyzedStyle": insights["analyzedStyle"],
-            "analyzedAttentionMarket": insights["analyzedAttentionMarket"]
-        }
+    videos_res = fetch_uploads(yt, channel_id, 20)
+    videos = videos_res.get("videos", [])
 
-        users.update_one(
-            {"_id": user_id},
-            {"$addToSet": {"channels": user_channel}}
-        )
+    update_job(job_id, step="analyzing")
+    insights = analyze_channel_insights(meta["description"], videos)
 
-        app = current_app._get_current_object()
+    if not insights or insights.get("format") == "Unknown":
+        return None, "Could not analyze channel — no videos or unknown format"
 
-        def run_outlier_job():
-            with app.app_context():
-                try:
-                    find_outliers_for_channel(str(user_id), user_email, user_channel)
-                except Exception as e:
-                    app.logger.error(f"[{user_email}] Error computing outliers after adding channel {channel_id}: {e}")
+    handle = chan_info["items"][0]["snippet"].get("customUrl") or f"channel/{channel_id}"
 
+    user_channel = {
+        "handle": handle,
+        "channelId": meta["channelId"],
+        "channelTitle": meta["channelTitle"],
+        "avatar": meta["avatar"],
+        "analyzedNiche": insights["analyzedNiche"],
+        "analyzedStyle": insights["analyzedStyle"],
+        "analyzedAttentionMarket": insights["analyzedAttentionMarket"]
+    }
 
-        executor.submit(run_outlier_job)
+    update_job(job_id, step="saving")
+    result = mongo.db.users.update_one(
+        {"_id": ObjectId(user_id), "channels.channelId": {"$ne": channel_id}},
+        {"$push": {"channels": user_channel}}
+    )
+    if not result.matched_count:
+        return None, "Channel already added"
 
-        return jsonify(user_channel)
+    return user_channel, None
 
-    except Exception as e:
-        current_app.logger.error(f"Failed to add channel for user {data['email']}: {str(e)}")
-        return jsonify({"error": f"Failed to add channel: {str(e)}"}), 500
+@channel_bp.route("/add/<job_id>", methods=["GET"])
+@auth_and_csrf_required
+@limiter.limit("60 per minute")
+def add_channel_status(data, job_id):
+    job = get_job(job_id, data["user_id"])
+    if not job or job.get("kind") != "add_channel":
+        return jsonify({"error": "Job not found"}), 404
+
+    response = {"jobId": job_id, "status": job["status"], "step": job.get("step")}
+    if job["status"] == "done":
+        response["channel"] = job["result"]
+    elif job["status"] == "failed":
+        response["error"] = job.get("error")
+    return jsonify(response)
 
 @channel_bp.route("/remove", methods=["POST"])
 @auth_and_csrf_required
@@ -289,13 +361,16 @@ def remove_channel(data):
         # Redis cleanup
         redis = current_app.extensions["redis"]
         user_id_str = str(user_id)
+        delete_profile_embeddings(user_id_str, channel_id)
 
         patterns = [
             f"outliers:{user_id_str}:{channel_id}",
             f"insights:{channel_id}:*",
             f"channel_stats:{channel_id}",
+            f"stale:channel_stats:{channel_id}",
             f"channel_metadata:{channel_id}",
             f"channel_videos:{channel_id}:*",
+            f"stale:channel_videos:{channel_id}:*",
             f"notifs:{user_id_str}:{channel_id}",
         ]
 
@@ -326,19 +401,11 @@ def get_channel_metadata(data, channel_id):
             return jsonify({"channel": cached})
 
         yt = get_youtube_client()
-        chan_info = yt.channels().list(
-            part="snippet,statistics,contentDetails",
-            id=channel_id
-        ).execute()
+        meta = fetch_channel_metadata(yt, channel_id)
 
-        if not chan_info["items"]:
+        if not meta:
             return jsonify({"error": "Channel not found"}), 404
 
-        meta = parse_channel_metadata(chan_info)
-
-        # Save to Redis cache (TTL: 1 day)
-        set_redis_cache(redis, redis_key, meta, ttl_seconds=86400)
-
         return jsonify({"channel": meta})
 
     except Exception as e:
@@ -362,77 +429,61 @@ def get_channel_videos(data, channel_id):
         redis = current_app.extensions["redis"]
         redis_key = f"channel_videos:{channel_id}:{content_type}"
 
-        if not page_token:
-            cached = get_redis_cache(redis, redis_key)
-            if cached:
-                # Return max 50 videos from cache
-                return jsonify({
-                    "videos": cached.get("videos", [])[:50],
-                    "nextPageToken": cached.get("nextPageToken")
-                })
-
-        yt = get_youtube_client()
+        def scan_videos(start_token):
+            yt = get_youtube_client()
+
+            MAX_SCAN_PAGES = 5
+            TARGET_COUNT = 10
+            page_count = 0
+            filtered_videos = []
+            next_token = start_token
+
+            while page_count < MAX_SCAN_PAGES:
+                videos_res = fetch_uploads(yt, channel_id, 30, next_token)
+                if videos_res.get("notFound"):
+                    return None
+                raw_videos = videos_res.get("videos", [])
+                next_token = videos_res.get("nextPageToken")
+
+                # Filter videos by content type
+                for v in raw_videos:
+                    is_short = v.get("isShort", False)
+                    if content_type == "shorts" and not is_short:
+                        continue
+                    if content_type == "longform" and is_short:
+                        continue
+                    filtered_videos.append(v)
+
+                if len(filtered_videos) >= TARGET_COUNT or not next_token:
+                    break
+
+                page_count += 1
+
+            # Compute outlier scores
+            outlier_scores = compute_outlier_scores(filtered_videos)
+            for idx, video in enumerate(filtered_videos):
+                video["outlierScore"] = outlier_scores[idx]
+
+            return {
+                "videos": filtered_videos[:50],  # cap size
+                "nextPageToken": next_token
+            }
 
-        chan_info = yt.channels().list(
-            part="snippet,statistics,contentDetails",
-            id=channel_id
-        ).execute()
+        if page_token:
+            result = scan_videos(page_token)
+        else:
+            # First page is shared: one worker scans, concurrent requests reuse its result
+            result = get_or_set_redis_cache(
+                redis, redis_key, lambda: scan_videos(None), ttl_seconds=600  # 10 min cache
+            )
 
-        if not chan_info["items"]:
+        if result is None:
             return jsonify({"error": "Channel not found"}), 404
 
-        meta = parse_channel_metadata(chan_info)
-        uploads_id = meta["uploadsId"]
-
-        MAX_SCAN_PAGES = 5
-        TARGET_COUNT = 10
-        page_count = 0
-        filtered_videos = []
-        next_token = page_token
-
-        while page_count < MAX_SCAN_PAGES:
-            videos_res = fetch_channel_videos(yt, uploads_id, 30, next_token)
-            raw_videos = videos_res.get("videos", [])
-            next_token = videos_res.get("nextPageToken")
-
-            # Filter videos by content type
-            for v in raw_videos:
-                is_short = v.get("isShort", False)
-                if content_type == "shorts" and not is_short:
-                    continue
-                if content_type == "longform" and is_short:
-                    continue
-                filtered_videos.append(v)
-
-            if len(filtered_videos) >= TARGET_COUNT or not next_token:
-                break
-
-            page_count += 1
-
-        # Compute outlier scores
-        outlier_scores = compute_outlier_scores(filtered_videos)
-        for idx, video in enumerate(filtered_videos):
-            video["outlierScore"] = outlier_scores[idx]
-
-        # If no pageToken, merge with existing cache
-        if not page_token:
-            existing_cache = get_redis_cache(redis, redis_key) or {}
-            existing_videos = existing_cache.get("videos", [])
-            existing_ids = {v["videoId"] for v in existing_videos}
-
-            for vid in filtered_videos:
-                if vid["videoId"] not in existing_ids:
-                    existing_videos.append(vid)
-
-            existing_videos = existing_videos[:50]  # cap size
-            set_redis_cache(redis, redis_key, {
-                "videos": existing_videos,
-                "nextPageToken": next_token
-            }, ttl_seconds=600)  # 10 min cache
-
         return jsonify({
-            "videos": filtered_videos,
-            "nextPageToken": next_token
+            # timeAgo is relative to now, so it's added here rather than cached
+            "videos": with_time_ago(result.get("videos", [])[:50]),
+            "nextPageToken": result.get("nextPageToken")
         })
 
     except Exception as e:
@@ -461,18 +512,12 @@ def get_channel_insights(data, channel_id):
         return jsonify(cached)
 
     yt = get_youtube_client()
-    chan_info = yt.channels().list(
-        part="snippet,statistics,contentDetails",
-        id=channel_id
-    ).execute()
+    meta = fetch_channel_metadata(yt, channel_id)
 
-    if not chan_info["items"]:
+    if not meta:
         return jsonify({"error": "Channel not found"}), 404
 
-    meta = parse_channel_metadata(chan_info)
-    uploads_id = meta["uploadsId"]
-
-    videos_res = fetch_channel_videos(yt, uploads_id, 5)
+    videos_res = fetch_uploads(yt, channel_id, 5)
     videos = videos_res.get("videos", [])
     insights = analyze_channel_insights(meta["description"], videos)
 
@@ -493,12 +538,15 @@ def get_channel_insights(data, channel_id):
     if not my_profile:
         return jsonify({"error": "Could not find your channel profile in your saved channels. Add it first."}), 400
 
-    user_attention_vector = embed_text(my_profile.get("analyzedAttentionMarket", ""))
-    comp_attention_vector = embed_text(insights["analyzedAttentionMarket"])
-    attention_similarity = cosine_similarity(comp_attention_vector, user_attention_vector)
+    # The user's vectors are stored with their profile; only the competitor's are embedded
+    embedded = embed_profile(
+        data["user_id"], my_profile, [insights["analyzedAttentionMarket"], insights["analyzedNiche"]]
+    )
+    if embedded is None:
+        return jsonify({"error": "Embedding service unavailable"}), 503
+    user_niche_vector, user_attention_vector, (comp_attention_vector, comp_niche_vector) = embedded
 
-    user_niche_vector = embed_text(my_profile.get("analyzedNiche", "unknown"))
-    comp_niche_vector = embed_text(insights["analyzedNiche"])
+    attention_similarity = cosine_similarity(comp_attention_vector, user_attention_vector)
     niche_similarity = cosine_similarity(comp_niche_vector, user_niche_vector)
 
     niche_match = niche_similarity >= 0.995
@@ -4,7 +4,7 @@ from utils.security import auth_and_csrf_required
 from bson.objectid import ObjectId
 from flask import current_app
 from datetime import datetime, timezone
-from utils.youtube_api import get_youtube_client
+from utils.youtube_api import get_youtube_client, execute_conditional
 from extensions import limiter, mongo
 
 competitor_tracker_bp = Blueprint("competitor_tracker", __name__)
@@ -177,11 +177,12 @@ def add_competitor(user_data, channel_id, list_id):
         subscriber_count = cached.get("subscriberCount", 0)
     else:
         yt = get_youtube_client()
-        chan_info = yt.channels().list(
+        chan_info = execute_conditional(yt.channels().list(
             part="snippet,statistics",
-            id=competitor_channel_id
-        ).execute()
-        if not chan_info["items"]:
+            id=competitor_channel_id,
+            fields="etag,items(id,snippet(title,thumbnails/default/url),statistics/subscriberCount)"
+        ))
+        if not chan_info.get("items"):
             return jsonify({"error": "Competitor channel not found"}), 404
 
         snippet = chan_info["items"][0]["snippet"]
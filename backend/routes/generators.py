@@ -1,73 +1,19 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from utils.db import find_user_channel
 from utils.security import auth_and_csrf_required
-from openai import OpenAI
+from utils.llm import chat_completion, stream_chat_completion
+from utils.json_stream import JSONArrayStream
 import json
 from extensions import limiter, mongo
-from utils.youtube_api import get_youtube_client, fetch_channel_videos
-from utils.parser import parse_channel_metadata
+from utils.title_context import get_title_context
 
 generators_bp = Blueprint("generators", __name__)
 
-@generators_bp.route("/title", methods=["POST"])
-@auth_and_csrf_required
-@limiter.limit("5 per minute")
-def generate_title(data):
-    body = request.get_json()
-    idea_text = body.get("idea", "").strip()
-    idea_text = idea_text.replace("\n", " ").strip()
-    if len(idea_text) > 200:
-        return jsonify({"error": "Idea text is too long (max 200 characters)"}), 400
-
-    channel_id = body.get("channelId")
-
-    if not idea_text or not channel_id:
-        return jsonify({"error": "Missing required fields: idea, channelId"}), 400
-
-    profile = find_user_channel(mongo, data["user_id"], channel_id)
-    if not profile:
-        return jsonify({"error": "Could not find your channel profile. Add it first."}), 400
-
-    yt = get_youtube_client()
-
-    chan_info = yt.channels().list(
-        part="snippet,contentDetails",
-        id=channel_id
-    ).execute()
-
-    if not chan_info.get("items"):
-        return jsonify({"error": "Channel not found"}), 404
-
-    meta = parse_channel_metadata(chan_info)
-
-    videos_res = fetch_channel_videos(yt, meta["uploadsId"], max_videos=15)
-    videos = videos_res.get("videos", [])
+TITLE_MODEL = "gpt-4o"
 
-    recent_titles = [
-        v.get("title", "")
-        for v in videos
-        if not v.get("isShort", False)
-    ][:5]
+TITLE_SYSTEM_PROMPT = """You are an expert YouTube strategist. You MUST comply with every instruction given, and respond with pure JSON only.
 
-    prompt = f"""
-You are an expert YouTube strategist. Your task is to turn the user’s new video idea into 10 viral, click-worthy YouTube titles. These titles must closely match the user's existing channel style and follow all formatting and tonal rules below.
-
----
-
-**User's Channel Profile**
-Niche: '{profile.get("analyzedNiche", "unknown")}'
-Content Style: '{profile.get("analyzedStyle", "unknown")}'
-Target Audience: '{profile.get("analyzedAttentionMarket", "unknown")}'
-
----
-
-**User's Recent Video Titles**
-{chr(5).join([f"{i+1}. {t}" for i, t in enumerate(recent_titles)])}
-
----
-
-**New Video Idea**
-"{idea_text}"
+Your task is to turn the user’s new video idea into 10 viral, click-worthy YouTube titles. These titles must closely match the user's existing channel style and follow all formatting and tonal rules below. The user's channel profile, recent video titles and new video idea follow in the user message.
 
 ---
 
@@ -99,15 +45,64 @@ Target Audience: '{profile.get("analyzedAttentionMarket", "unknown")}'
 
 You must stick to these instructions exactly. Do not break format or ignore constraints.
 """
+
+def _title_prompt(data):
+    """
+    Validate a title request and build its user message.
+    Returns (prompt, None), or (None, error response).
+    """
+    body = request.get_json()
+    idea_text = body.get("idea", "").strip()
+    idea_text = idea_text.replace("\n", " ").strip()
+    if len(idea_text) > 200:
+        return None, (jsonify({"error": "Idea text is too long (max 200 characters)"}), 400)
+
+    channel_id = body.get("channelId")
+
+    if not idea_text or not channel_id:
+        return None, (jsonify({"error": "Missing required fields: idea, channelId"}), 400)
+
+    profile = find_user_channel(mongo, data["user_id"], channel_id)
+    if not profile:
+        return None, (jsonify({"error": "Could not find your channel profile. Add it first."}), 400)
+
+    # Recent titles come from a per-channel cache, so repeat ideas skip YouTube
+    context = get_title_context(channel_id)
+    if context is None:
+        return None, (jsonify({"error": "Channel not found"}), 404)
+    recent_titles = context["recentTitles"]
+
+    prompt = f"""**User's Channel Profile**
+Niche: '{profile.get("analyzedNiche", "unknown")}'
+Content Style: '{profile.get("analyzedStyle", "unknown")}'
+Target Audience: '{profile.get("analyzedAttentionMarket", "unknown")}'
+
+---
+
+**User's Recent Video Titles**
+{chr(5).join([f"{i+1}. {t}" for i, t in enumerate(recent_titles)])}
+
+---
+
+**New Video Idea**
+"{idea_text}"
+"""
+    return prompt, None
+
+@generators_bp.route("/title", methods=["POST"])
+@auth_and_csrf_required
+@limiter.limit("5 per minute")
+def generate_title(data):
+    prompt, error = _title_prompt(data)
+    if error:
+        return error
+
     current_app.logger.info(f"[Title Generator Prompt] {prompt}")
-    openai_client = OpenAI(api_key=current_app.config["OPENAI_API_KEY"])
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert YouTube strategist. You MUST comply with every instruction given, and respond with pure JSON only."},
-                {"role": "user", "content": prompt}
-            ],
+        response = chat_completion(
+            TITLE_MODEL,
+            TITLE_SYSTEM_PROMPT,
+            prompt,
             max_tokens=600,
             temperature=1.0
         )
@@ -128,4 +123,52 @@ You must stick to these instructions exactly. Do not break format or ignore cons
 
     except Exception as e:
         current_app.logger.error(f"Title generation failed: {str(e)}")
-        return jsonify({"error": "Failed to generate titles"}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to generate titles"}), 500
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@generators_bp.route("/title/stream", methods=["POST"])
+@auth_and_csrf_required
+@limiter.limit("5 per minute")
+def stream_titles(data):
+    """
+    Same as /title, but sent as Server-Sent Events: a `title` event for each title
+    as soon as the model has finished writing it, then `done` (or `error`).
+    """
+    prompt, error = _title_prompt(data)
+    if error:
+        return error
+
+    current_app.logger.info(f"[Title Generator Prompt] {prompt}")
+
+    def events():
+        parser = JSONArrayStream()
+        count = 0
+        try:
+            for piece in stream_chat_completion(
+                TITLE_MODEL,
+                TITLE_SYSTEM_PROMPT,
+                prompt,
+                max_tokens=600,
+                temperature=1.0
+            ):
+                for title in parser.feed(piece):
+                    if isinstance(title, str):
+                        count += 1
+                        yield _sse("title", {"index": count - 1, "title": title})
+
+            if not count:
+                raise ValueError("Model response is not a JSON list")
+            yield _sse("done", {"count": count})
+
+        except Exception as e:
+            current_app.logger.error(f"Title generation failed: {str(e)}")
+            yield _sse("error", {"error": "Failed to generate titles"})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Flush each event through proxies instead of buffering the response
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,18 +1,167 @@
 from flask import Blueprint, request, jsonify, current_app
 from utils.parser import chunkify
 from utils.security import auth_and_csrf_required
-from utils.embeddings import embed_text, cosine_similarity
-import statistics, datetime, math, isodate
-from utils.youtube_api import get_youtube_client
+from utils.embeddings import embed_text
+from utils.similarity import SimilarityMatrix
+import statistics, datetime, math
+from utils.youtube_api import get_youtube_client, track_cache, batch_channel_uploads
+from utils.video_cache import get_videos, parse_timestamp
+from utils.channel_catalog import search_catalog, upsert_channels, catalog_text
 import re
 from extensions import limiter
 
 niche_explorer_bp = Blueprint("niche_explorer", __name__)
 
 MAX_CHANNELS = 30
+# Below this many catalog matches, the live API is searched as well
+MIN_CATALOG_RESULTS = 10
 ENGAGEMENT_THRESHOLD = 0.1
 RELEVANCE_THRESHOLD = 0.25
 
+# Partial-response masks: only the fields niche_search reads
+SEARCH_FIELDS = "items(id/videoId,snippet(title,channelId,channelTitle))"
+CHANNEL_FIELDS = "items(id,snippet(title,description,thumbnails/default/url),statistics/subscriberCount)"
+
+def _matches_type(seconds, video_type):
+    return not ((video_type == "shorts" and seconds > 180) or (video_type == "longform" and seconds <= 180))
+
+def _published_since(video, cutoff):
+    published = parse_timestamp(video["publishedAt"])
+    return published is not None and published >= cutoff
+
+def _is_engaged(ch):
+    top_views = max(ch["recentViews"], default=0)
+    return top_views / (ch["subscriberCount"] + 1) >= ENGAGEMENT_THRESHOLD
+
+def _channel_from_catalog(doc, video_type, published_after):
+    """
+    Response-shaped channel from a catalog entry, or None if it has no upload of
+    the requested type inside the time frame.
+    """
+    videos = doc.get("recentVideos", [])
+    cutoff = parse_timestamp(published_after)
+    if not any(
+        _matches_type(v["seconds"], video_type) and _published_since(v, cutoff)
+        for v in videos
+    ):
+        return None
+    return {
+        "channelId": doc["_id"],
+        "channelTitle": doc["channelTitle"],
+        "avatar": doc["avatar"],
+        "subscriberCount": doc["subscriberCount"],
+        "recentTitles": [v["title"] for v in videos],
+        "recentViews": [v["views"] for v in videos if _matches_type(v["seconds"], video_type)],
+        "description": doc.get("description", ""),
+    }
+
+def _search_videos(yt, query, video_type, published_after):
+    durations = ["short"] if video_type == "shorts" else ["medium", "long"]
+    items = []
+    for duration in durations:
+        search = yt.search().list(
+            part="snippet",
+            q=query,
+            type="video",
+            order="viewCount",
+            publishedAfter=published_after,
+            videoDuration=duration,
+            maxResults=50,
+            fields=SEARCH_FIELDS
+        ).execute()
+        items.extend(search.get("items", []))
+    return items
+
+def _live_channels(query_vector, query, video_type, published_after, exclude=()):
+    """
+    Relevant, engaged channels found through search.list, most relevant first.
+    Every channel fetched along the way is added to the catalog. None if embedding fails.
+    """
+    yt = get_youtube_client()
+    video_items = [
+        vid for vid in _search_videos(yt, query, video_type, published_after)
+        if "videoId" in vid.get("id", {})
+    ]
+    video_texts = [
+        f"{vid.get('snippet', {}).get('title', 'N/A')} {vid.get('snippet', {}).get('channelTitle', 'N/A')}"
+        for vid in video_items
+    ]
+
+    video_vectors = embed_text(video_texts)
+    if video_vectors is None:
+        return None
+
+    # Determine relevant videos initially, most similar first
+    relevant = SimilarityMatrix(video_vectors).search(query_vector, threshold=RELEVANCE_THRESHOLD)
+
+    channel_ids = list(dict.fromkeys(
+        video_items[idx]["snippet"]["channelId"] for idx, _ in relevant
+        if video_items[idx]["snippet"]["channelId"] not in exclude
+    ))
+    channel_ids = channel_ids[:MAX_CHANNELS]
+
+    # Fetch channels, then everyone's recent uploads in batched calls
+    channel_map, catalog_entries = {}, {}
+    for chunk in chunkify(channel_ids, 20):
+        details = yt.channels().list(
+            part="snippet,statistics", id=",".join(chunk), fields=CHANNEL_FIELDS
+        ).execute()
+        for chan in details.get("items", []):
+            ch_id = chan["id"]
+            channel_map[ch_id] = {
+                "channelId": ch_id,
+                "channelTitle": chan["snippet"]["title"],
+                "avatar": chan["snippet"]["thumbnails"]["default"]["url"].replace("http://", "https://"),
+                "subscriberCount": int(chan.get("statistics", {}).get("subscriberCount", 0)),
+                "recentTitles": [],
+                "recentViews": [],
+                "description": chan["snippet"].get("description", "")
+            }
+
+    uploads = {
+        ch_id: [item["contentDetails"]["videoId"] for item in items]
+        for ch_id, items in batch_channel_uploads(yt, list(channel_map), max_results=10).items()
+    }
+    videos = get_videos(yt, [vid for video_ids in uploads.values() for vid in video_ids])
+
+    for ch_id, channel in channel_map.items():
+        recent_videos = []
+        for vid in (videos[v] for v in uploads.get(ch_id, []) if v in videos):
+            if _matches_type(vid.total_seconds, video_type):
+                channel["recentViews"].append(vid.view_count)
+
+            channel["recentTitles"].append(vid.title)
+            recent_videos.append({
+                "videoId": vid.video_id,
+                "title": vid.title,
+                "views": vid.view_count,
+                "seconds": vid.total_seconds,
+                "publishedAt": vid.published_at,
+            })
+        catalog_entries[ch_id] = {**channel, "recentVideos": recent_videos}
+
+    # Embed every fetched channel, so the catalog also learns the ones filtered out below
+    ch_keys = list(channel_map)
+    combined_texts = [
+        catalog_text(ch["channelTitle"], ch["description"], ch["recentTitles"])
+        for ch in channel_map.values()
+    ]
+    if not combined_texts:
+        return {}
+
+    combined_vectors = embed_text(combined_texts)
+    if combined_vectors is None:
+        return None
+    upsert_channels([catalog_entries[ch_id] for ch_id in ch_keys], combined_vectors)
+
+    # Engagement filter & relevance
+    channel_matrix = SimilarityMatrix(combined_vectors, keys=ch_keys)
+    return {
+        ch_id: channel_map[ch_id]
+        for ch_id, _ in channel_matrix.search(query_vector, threshold=RELEVANCE_THRESHOLD)
+        if _is_engaged(channel_map[ch_id])
+    }
+
 @niche_explorer_bp.route("/search", methods=["POST"])
 @auth_and_csrf_required
 @limiter.limit("5 per minute")
@@ -41,130 +190,38 @@ def niche_search(user_data):
     if time_frame not in timeframes:
         return jsonify({"error": "Invalid time_frame"}), 400
 
+    if video_type not in ("shorts", "longform"):
+        return jsonify({"error": "Invalid video_type"}), 400
+
     now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
     published_after = (
         now - datetime.timedelta(days=timeframes[time_frame])
     ).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    yt = get_youtube_client()
-
-    # Initial video search
-    if video_type == "shorts":
-        search = yt.search().list(
-            part="snippet",
-            q=query,
-            type="video",
-            order="viewCount",
-            publishedAfter=published_after,
-            videoDuration="short",
-            maxResults=50
-        ).execute()
-        video_items = search.get("items", [])
-    elif video_type == "longform":
-        medium = yt.search().list(
-            part="snippet",
-            q=query,
-            type="video",
-            order="viewCount",
-            publishedAfter=published_after,
-            videoDuration="medium",
-            maxResults=50
-        ).execute()
-        long = yt.search().list(
-            part="snippet",
-            q=query,
-            type="video",
-            order="viewCount",
-            publishedAfter=published_after,
-            videoDuration="long",
-            maxResults=50
-        ).execute()
-        video_items = medium.get("items", []) + long.get("items", [])
-    else:
-        return jsonify({"error": "Invalid video_type"}), 400
-
     query_vector = embed_text(query)
+    if query_vector is None:
+        return jsonify({"error": "Embedding service unavailable"}), 503
 
-    # Determine relevant videos initially
-    video_info = []
-    for vid in video_items:
-        snippet = vid.get("snippet", {})
-        combined = f"{snippet.get('title', 'N/A')} {snippet.get('channelTitle', 'N/A')}"
-        video_info.append((vid, combined))
-
-    combined_vectors = embed_text([combined for _, combined in video_info])
-
-    relevant_videos = []
-    for idx, (vid, _) in enumerate(video_info):
-        sim = cosine_similarity(query_vector, combined_vectors[idx])
-        if sim >= RELEVANCE_THRESHOLD:
-            relevant_videos.append(vid)
-
-    channel_ids = list({vid["snippet"]["channelId"] for vid in relevant_videos if "videoId" in vid["id"]})
-    channel_ids = channel_ids[:MAX_CHANNELS]
-
-    # Fetch channels & recent uploads
-    channel_map = {}
-    for chunk in chunkify(channel_ids, 20):
-        details = yt.channels().list(part="snippet,statistics,contentDetails", id=",".join(chunk)).execute()
-        for chan in details.get("items", []):
-            ch_id = chan["id"]
-            uploads_id = chan["contentDetails"]["relatedPlaylists"]["uploads"]
-            channel_map[ch_id] = {
-                "channelId": ch_id,
-                "channelTitle": chan["snippet"]["title"],
-                "avatar": chan["snippet"]["thumbnails"]["default"]["url"].replace("http://", "https://"),
-                "subscriberCount": int(chan.get("statistics", {}).get("subscriberCount", 0)),
-                "recentTitles": [],
-                "recentViews": [],
-                "description": chan["snippet"].get("description", "")
-            }
-
-            playlist_items = yt.playlistItems().list(
-                part="snippet,contentDetails",
-                playlistId=uploads_id,
-                maxResults=10
-            ).execute()
-            video_ids = [item["contentDetails"]["videoId"] for item in playlist_items.get("items", [])]
-
-            for vchunk in chunkify(video_ids, 50):
-                vids = yt.videos().list(part="snippet,statistics,contentDetails", id=",".join(vchunk)).execute()
-                for vid in vids.get("items", []):
-                    snippet = vid["snippet"]
-                    title = snippet["title"]
-                    views = int(vid.get("statistics", {}).get("viewCount", 0))
-                    dur = isodate.parse_duration(vid.get("contentDetails", {}).get("duration", "PT0S")).total_seconds()
-
-                    if not ((video_type == "shorts" and dur > 180) or (video_type == "longform" and dur <= 180)):
-                        channel_map[ch_id]["recentViews"].append(views)
-
-                    channel_map[ch_id]["recentTitles"].append(title)
-
-    # Engagement filter
-    filtered = {}
-    for ch_id, ch in channel_map.items():
-        subs = ch["subscriberCount"]
-        top_views = max(ch["recentViews"], default=0)
-        engagement = top_views / (subs + 1)
-        if engagement >= ENGAGEMENT_THRESHOLD:
-            filtered[ch_id] = ch
-
-    # Embed combined text & determine relevance
-    combined_texts, combined_ch_keys = [], []
-    for ch_id, ch in filtered.items():
-        combined_titles = " ".join(ch["recentTitles"])
-        desc = ch.get("description", "").replace("\n", " ")[:500]
-        combined_text = f"{combined_titles} {ch['channelTitle']} {desc}"
-        combined_texts.append(combined_text)
-        combined_ch_keys.append(ch_id)
-
+    # Channels Streamline has already seen, straight from the catalog index
     final_channel_map = {}
-    if combined_texts:
-        combined_vectors = embed_text(combined_texts)
-        for idx, ch_id in enumerate(combined_ch_keys):
-            sim = cosine_similarity(query_vector, combined_vectors[idx])
-            if sim >= RELEVANCE_THRESHOLD:
-                final_channel_map[ch_id] = filtered[ch_id]
+    for doc, _ in search_catalog(query_vector, k=MAX_CHANNELS, threshold=RELEVANCE_THRESHOLD):
+        ch = _channel_from_catalog(doc, video_type, published_after)
+        if ch and _is_engaged(ch):
+            final_channel_map[ch["channelId"]] = ch
+        if len(final_channel_map) >= MAX_CHANNELS:
+            break
+
+    # Top up from the live API when the catalog has too little for this query
+    catalog_hit = len(final_channel_map) >= MIN_CATALOG_RESULTS
+    track_cache("channel_catalog", int(catalog_hit), int(not catalog_hit))
+    if not catalog_hit:
+        live = _live_channels(query_vector, query, video_type, published_after, exclude=final_channel_map)
+        if live is None:
+            return jsonify({"error": "Embedding service unavailable"}), 503
+        for ch_id, ch in live.items():
+            if len(final_channel_map) >= MAX_CHANNELS:
+                break
+            final_channel_map[ch_id] = ch
 
     # Score & sort
     results = []
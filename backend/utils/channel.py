@@ -1,64 +1,24 @@
 import statistics
 import re
 import json
+import hashlib
 from flask import current_app
-from openai import OpenAI
+from utils.db import get_or_set_redis_cache, set_redis_cache
+from utils.llm import chat_completion
 
-def compute_outlier_scores(videos):
-    scores = []
-    view_counts = [v.get("viewCount", 0) for v in videos]
+INSIGHTS_MODEL = "gpt-4o"
+# Bump when the prompt changes so cached analyses are redone
+INSIGHTS_PROMPT_VERSION = 2
+INSIGHTS_CACHE_TTL_SECONDS = 30 * 86400
+INSIGHTS_BATCH_SIZE = 8
 
-    for i, vc in enumerate(view_counts):
-        if vc == 0:
-            scores.append(0.0)
-            continue
+UNKNOWN_INSIGHTS = {
+    "analyzedNiche": "Unknown",
+    "analyzedStyle": "Unknown",
+    "analyzedAttentionMarket": "Unknown"
+}
 
-        neighbors = []
-        for offset in range(1, 6):
-            if i - offset >= 0 and view_counts[i - offset] > 0:
-                neighbors.append(view_counts[i - offset])
-            if i + offset < len(view_counts) and view_counts[i + offset] > 0:
-                neighbors.append(view_counts[i + offset])
-
-        if not neighbors:
-            scores.append(1.0)
-            continue
-
-        median_views = statistics.median(neighbors)
-        score = vc / median_views if median_views > 0 else 1.0
-        scores.append(round(score, 1))
-
-    return scores
-
-def analyze_channel_insights(channel_description, videos):
-    num_videos = len(videos)
-    if num_videos == 0:
-        return {
-            "analyzedNiche": "Unknown",
-            "analyzedStyle": "Unknown",
-            "analyzedAttentionMarket": "Unknown"
-        }
-
-    video_titles = [f"{i+1}. {v.get('title', '')}" for i, v in enumerate(videos[:3])]
-    video_descriptions = [f"{i+1}. {v.get('description', '')[:300]}" for i, v in enumerate(videos[:3])]
-
-    prompt = f"""
-You are analyzing a YouTube channel to infer the likely attention_market and style.
-
-Here is the channel:
-
-Channel description:
-\"\"\"{channel_description}\"\"\"  
-
-Recent video titles:
-{chr(5).join(video_titles)}
-
-Recent video descriptions:
-{chr(5).join(video_descriptions)}
-
----
-
-STYLE DEFINITIONS & RULES:
+_INSIGHTS_RULES = """STYLE DEFINITIONS & RULES:
 
 - **documentary** → Edited, factual, or narrated coverage (no personal opinions). Research, explainers, news, or structured storytelling. Use even if occasional informal remarks.
 
@@ -119,13 +79,13 @@ Where:
 
 Examples:
 
-{{
+{
     "attention_market": "Young Adults, M, [Entertainment]"
-}}
+}
 
-{{
+{
     "Middle-Aged, Mix, [Education]"
-}}
+}
 
 ---
 
@@ -138,60 +98,277 @@ Very Important:
 
 ---
 
-Respond with PURE JSON only — no extra text.  
+"""
+
+INSIGHTS_SYSTEM_PROMPT = """You are a senior YouTube strategist. Always respond with pure JSON only.
+
+You are analyzing a YouTube channel to infer the likely attention_market and style. The channel's description and recent videos follow in the user message.
+
+---
+
+""" + _INSIGHTS_RULES + """Respond with PURE JSON only — no extra text.  
 
 Format:  
-{{
+{
     "niche": "...",
     "style": "...",
     "attention_market": "..."
-}}
+}
+"""
+
+INSIGHTS_BATCH_SYSTEM_PROMPT = """You are a senior YouTube strategist. Always respond with pure JSON only.
+
+You are analyzing several YouTube channels to infer each one's likely attention_market and style. The channels follow in the user message, each under a "### Channel <number>" heading. Analyze every channel independently.
+
+---
+
+""" + _INSIGHTS_RULES + """Respond with PURE JSON only — no extra text. Include one result per channel, with its number.  
+
+Format:  
+{
+    "results": [
+        {
+            "channel": 1,
+            "niche": "...",
+            "style": "...",
+            "attention_market": "..."
+        }
+    ]
+}
 """
 
-    openai_client = OpenAI(api_key=current_app.config["OPENAI_API_KEY"])
+def compute_outlier_scores(videos):
+    scores = []
+    view_counts = [v.get("viewCount", 0) for v in videos]
+
+    for i, vc in enumerate(view_counts):
+        if vc == 0:
+            scores.append(0.0)
+            continue
+
+        neighbors = []
+        for offset in range(1, 6):
+            if i - offset >= 0 and view_counts[i - offset] > 0:
+                neighbors.append(view_counts[i - offset])
+            if i + offset < len(view_counts) and view_counts[i + offset] > 0:
+                neighbors.append(view_counts[i + offset])
+
+        if not neighbors:
+            scores.append(1.0)
+            continue
+
+        median_views = statistics.median(neighbors)
+        score = vc / median_views if median_views > 0 else 1.0
+        scores.append(round(score, 1))
+
+    return scores
+
+def insights_fingerprint(channel_description, videos):
+    """
+    Hash of exactly what the insights prompt sees: the channel description and the
+    first three titles and descriptions. New uploads change it.
+    """
+    parts = [INSIGHTS_MODEL, str(INSIGHTS_PROMPT_VERSION), channel_description or ""]
+    for v in videos[:3]:
+        parts += [v.get("title", ""), v.get("description", "")[:300]]
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+def _is_known(insights):
+    return all(
+        insights.get(k, "Unknown") != "Unknown"
+        for k in ("analyzedNiche", "analyzedStyle", "analyzedAttentionMarket")
+    )
+
+def analyze_channel_insights(channel_description, videos):
+    """
+    Niche, style and attention market for a channel, shared across users and routes.
+    Results are cached by content fingerprint, and concurrent requests for the same
+    channel wait on a single LLM call. Failed or "Unknown" analyses aren't cached.
+    """
+    if not videos:
+        return dict(UNKNOWN_INSIGHTS)
+
+    result = {}
+
+    def classify():
+        result.update(_classify_channel(channel_description, videos))
+        return result if _is_known(result) else None
+
+    try:
+        cached = get_or_set_redis_cache(
+            current_app.extensions["redis"],
+            f"llm_insights:{insights_fingerprint(channel_description, videos)}",
+            classify,
+            ttl_seconds=INSIGHTS_CACHE_TTL_SECONDS,
+            lock_seconds=60,
+            wait_seconds=20,
+        )
+        if cached is not None:
+            return cached
+    except Exception as e:
+        current_app.logger.warning(f"Insights cache unavailable: {e}")
+
+    return result or _classify_channel(channel_description, videos)
+
+def _channel_details(channel_description, videos):
+    video_titles = [f"{i+1}. {v.get('title', '')}" for i, v in enumerate(videos[:3])]
+    video_descriptions = [f"{i+1}. {v.get('description', '')[:300]}" for i, v in enumerate(videos[:3])]
+
+    return f"""Channel description:
+\"\"\"{channel_description}\"\"\"
+
+Recent video titles:
+{chr(5).join(video_titles)}
+
+Recent video descriptions:
+{chr(5).join(video_descriptions)}
+"""
+
+def _parse_reply(raw_reply):
+    clean_reply = re.sub(r"^```(?:json)?|```$", "", raw_reply, flags=re.MULTILINE).strip()
+    return json.loads(clean_reply)
+
+def _to_insights(parsed):
+    niche = parsed.get("niche", "Unknown")
+    style = parsed.get("style", "Unknown")
+    attention_market = parsed.get("attention_market", "Unknown")
+
+    try:
+        age_group = attention_market.split(", ")[0]
+        if age_group.lower() == "kids":
+            style = "Kids Content"
+    except Exception:
+        pass
+
+    return {
+        "analyzedNiche": niche,
+        "analyzedStyle": style,
+        "analyzedAttentionMarket": attention_market
+    }
+
+def _classify_channel(channel_description, videos):
+    prompt = "Here is the channel:\n\n" + _channel_details(channel_description, videos)
 
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a senior YouTube strategist. Always respond with pure JSON only."},
-                {"role": "user", "content": prompt}
-            ],
+        response = chat_completion(
+            INSIGHTS_MODEL,
+            INSIGHTS_SYSTEM_PROMPT,
+            prompt,
             max_tokens=400,
             temperature=0.0
         )
-        raw_reply = response.choices[0].message.content
-
-        clean_reply = re.sub(r"^```(?:json)?|```$", "", raw_reply, flags=re.MULTILINE).strip()
         try:
-            parsed = json.loads(clean_reply)
+            parsed = _parse_reply(response.choices[0].message.content)
         except json.JSONDecodeError:
             current_app.logger.warning("OpenAI returned malformed JSON.")
-            return {
-                "analyzedNiche": "Unknown",
-                "analyzedStyle": "Unknown",
-                "analyzedAttentionMarket": "Unknown"
-            }
+            return dict(UNKNOWN_INSIGHTS)
 
-        niche = parsed.get("niche", "Unknown")
-        style = parsed.get("style", "Unknown")
-        attention_market = parsed.get("attention_market", "Unknown")
-
-        try:
-            age_group = attention_market.split(", ")[0]
-            if age_group.lower() == "kids":
-                style = "Kids Content"
-        except Exception:
-            pass
+        return _to_insights(parsed)
 
     except Exception as e:
-        niche = "Unknown"
-        style = "Unknown"
-        attention_market = "Unknown"
         current_app.logger.error(f"OpenAI analysis failed: {e}")
+        return dict(UNKNOWN_INSIGHTS)
+
+STYLES = {
+    "documentary", "commentary", "compilation", "podcast", "vlog", "reaction", "educational",
+    "gameplay", "kids content", "diy", "music", "animation", "stories", "challenge"
+}
+_MOTIVATION = r"(Entertainment|Education|Connection)"
+_ATTENTION_MARKET_RE = re.compile(
+    rf"^(Kids|Teens|Young Adults|Middle-Aged|Seniors|Mixed Ages), (M|F|Mix), \[{_MOTIVATION}(, {_MOTIVATION})?\]$",
+    re.IGNORECASE
+)
+
+def _valid_batch_entry(entry):
+    return (
+        isinstance(entry.get("niche"), str) and entry["niche"].strip() != ""
+        and isinstance(entry.get("style"), str) and entry["style"].lower() in STYLES
+        and isinstance(entry.get("attention_market"), str)
+        and _ATTENTION_MARKET_RE.match(entry["attention_market"]) is not None
+    )
+
+def _classify_batch(channels):
+    """
+    Classify several (channel_description, videos) in one LLM call.
+    Returns {index: insights} for the entries that came back valid; the rest are left out.
+    """
+    prompt = "\n".join(
+        f"### Channel {i + 1}\n\n{_channel_details(description, videos)}"
+        for i, (description, videos) in enumerate(channels)
+    )
 
-    return {
-        "analyzedNiche": niche,
-        "analyzedStyle": style,
-        "analyzedAttentionMarket": attention_market
-    }
\ No newline at end of file
+    try:
+        response = chat_completion(
+            INSIGHTS_MODEL,
+            INSIGHTS_BATCH_SYSTEM_PROMPT,
+            prompt,
+            max_tokens=100 * len(channels) + 100,
+            temperature=0.0
+        )
+        results = _parse_reply(response.choices[0].message.content).get("results")
+    except Exception as e:
+        current_app.logger.error(f"OpenAI batch analysis failed: {e}")
+        return {}
+
+    classified = {}
+    for entry in results if isinstance(results, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        number = entry.get("channel")
+        if not isinstance(number, int) or not 1 <= number <= len(channels) or not _valid_batch_entry(entry):
+            continue
+        insights = _to_insights(entry)
+        if _is_known(insights):
+            classified[number - 1] = insights
+    return classified
+
+def analyze_channels_insights(channels):
+    """
+    Batch analyze_channel_insights() for background work: takes a list of
+    (channel_description, videos) and returns their insights in the same order.
+    Cached analyses are reused, and the rest are classified INSIGHTS_BATCH_SIZE
+    channels per LLM call. Valid entries are written to the shared insights cache;
+    channels whose entry is missing or invalid are analysed on their own.
+    """
+    redis = current_app.extensions["redis"]
+    results = [None] * len(channels)
+
+    # The same channel can appear more than once; classify it once
+    by_key = {}
+    for i, (description, videos) in enumerate(channels):
+        if videos:
+            by_key.setdefault(f"llm_insights:{insights_fingerprint(description, videos)}", []).append(i)
+        else:
+            results[i] = dict(UNKNOWN_INSIGHTS)
+
+    try:
+        cached = redis.mget(list(by_key)) if by_key else []
+    except Exception as e:
+        current_app.logger.warning(f"Insights cache unavailable: {e}")
+        cached = [None] * len(by_key)
+
+    misses = []
+    for (key, indices), raw in zip(by_key.items(), cached):
+        if raw:
+            for i in indices:
+                results[i] = json.loads(raw)
+        else:
+            misses.append((key, indices))
+
+    for start in range(0, len(misses), INSIGHTS_BATCH_SIZE):
+        chunk = misses[start:start + INSIGHTS_BATCH_SIZE]
+        classified = _classify_batch([channels[indices[0]] for _, indices in chunk])
+
+        for j, (key, indices) in enumerate(chunk):
+            insights = classified.get(j)
+            if insights is None:
+                insights = analyze_channel_insights(*channels[indices[0]])
+            else:
+                try:
+                    set_redis_cache(redis, key, insights, INSIGHTS_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    current_app.logger.warning(f"Failed to cache insights: {e}")
+            for i in indices:
+                results[i] = insights
+
+    return results
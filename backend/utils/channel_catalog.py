@@ -0,0 +1,143 @@
+from flask import current_app
+from datetime import datetime, timezone, timedelta
+from bson.binary import Binary
+from pymongo import UpdateOne
+import threading
+import time
+from utils.similarity import IVFIndex
+from utils.embeddings import embedding_model_id, embedding_codec
+from utils.vector_codec import encode, decode
+from extensions import mongo
+
+# Catalog of channels seen by niche search (`channel_catalog` collection):
+#   _id              channel ID
+#   channelTitle, avatar, description, subscriberCount
+#   recentVideos     [{videoId, title, views, seconds, publishedAt}], newest first
+#   embedding        encoded vector of catalog_text() (utils.vector_codec)
+#   embeddingModel   model and width it came from; only the current one is indexed
+#   updatedAt        last refresh from the live API
+#
+# The ANN index over the embeddings is rebuilt by a scheduled job and shared through
+# Redis (`channel_catalog:index` hash: version, data = IVFIndex bytes); each worker
+# reloads it when the version changes.
+
+CATALOG_MAX_AGE_SECONDS = 7 * 86400        # older entries aren't served (stale stats)
+CATALOG_RETENTION_SECONDS = 30 * 86400     # older entries are dropped at rebuild
+INDEX_PROBES = 8
+INDEX_KEY = "channel_catalog:index"
+# Held for most of the 30 min rebuild interval, so only one worker rebuilds per run
+REBUILD_LOCK_SECONDS = 25 * 60
+
+_index_lock = threading.Lock()
+_loaded = {"version": None, "index": None}
+
+def catalog_text(channel_title, description, recent_titles):
+    desc = (description or "").replace("\n", " ")[:500]
+    return f"{' '.join(recent_titles)} {channel_title} {desc}"
+
+def upsert_channels(channels, vectors):
+    """
+    Store freshly fetched channels with their embeddings. `channels` are dicts with
+    channelId, channelTitle, avatar, description, subscriberCount and recentVideos.
+    """
+    if not channels:
+        return
+    now = datetime.now(timezone.utc)
+    model_id, codec = embedding_model_id(), embedding_codec()
+    ops = [
+        UpdateOne(
+            {"_id": ch["channelId"]},
+            {"$set": {
+                "channelTitle": ch["channelTitle"],
+                "avatar": ch["avatar"],
+                "description": ch["description"],
+                "subscriberCount": ch["subscriberCount"],
+                "recentVideos": ch["recentVideos"],
+                "embedding": Binary(encode(vector, codec)),
+                "embeddingModel": model_id,
+                "updatedAt": now,
+            }},
+            upsert=True
+        )
+        for ch, vector in zip(channels, vectors)
+    ]
+    try:
+        mongo.db.channel_catalog.bulk_write(ops, ordered=False)
+    except Exception as e:
+        current_app.logger.warning(f"Channel catalog write failed: {e}")
+
+def load_index():
+    """
+    The current ANN index, reloaded when a newer one has been published.
+    None until the first rebuild.
+    """
+    redis = current_app.extensions["redis_bytes"]
+    try:
+        version = redis.hget(INDEX_KEY, "version")
+    except Exception as e:
+        current_app.logger.warning(f"Failed to check channel catalog index version: {e}")
+        return _loaded["index"]
+    if version is None:
+        return None
+
+    with _index_lock:
+        if _loaded["version"] != version:
+            try:
+                # Read both together: a rebuild may have landed since the version check
+                version, raw = redis.hmget(INDEX_KEY, ["version", "data"])
+                _loaded.update(version=version, index=IVFIndex.from_bytes(raw))
+            except Exception as e:
+                current_app.logger.warning(f"Failed to load channel catalog index: {e}")
+        return _loaded["index"]
+
+def search_catalog(query_vector, k, threshold=None):
+    """
+    [(catalog doc, score)] for the nearest fresh catalog channels, most similar first.
+    """
+    index = load_index()
+    if index is None or index.dimensions != len(query_vector):
+        return []
+
+    # Oversample: some hits will be stale or filtered out by the caller
+    hits = index.search(query_vector, k=k * 3, nprobe=INDEX_PROBES, threshold=threshold)
+    if not hits:
+        return []
+
+    fresh_since = datetime.now(timezone.utc) - timedelta(seconds=CATALOG_MAX_AGE_SECONDS)
+    docs = {
+        doc["_id"]: doc
+        for doc in mongo.db.channel_catalog.find(
+            {"_id": {"$in": [ch_id for ch_id, _ in hits]}, "updatedAt": {"$gte": fresh_since}},
+            {"embedding": 0}
+        )
+    }
+    return [(docs[ch_id], score) for ch_id, score in hits if ch_id in docs]
+
+def rebuild_catalog_index():
+    """
+    Rebuild the shared ANN index from the catalog and publish it to every worker.
+    The first worker to run it in an interval does the rebuild; the others skip it.
+    """
+    redis = current_app.extensions["redis"]
+    # Not released when done: the lock expiring is what lets the next run rebuild
+    if not redis.set("lock:channel_catalog_rebuild", "1", nx=True, ex=REBUILD_LOCK_SECONDS):
+        return
+
+    catalog = mongo.db.channel_catalog
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=CATALOG_RETENTION_SECONDS)
+    catalog.delete_many({"updatedAt": {"$lt": cutoff}})
+
+    keys, vectors = [], []
+    for doc in catalog.find({"embeddingModel": embedding_model_id()}, {"embedding": 1}):
+        if doc.get("embedding"):
+            keys.append(doc["_id"])
+            vectors.append(decode(doc["embedding"]))
+    if not keys:
+        return
+
+    # One HSET, so readers never see data from one build with another's version
+    version = f"{time.time():.6f}:{len(keys)}"
+    current_app.extensions["redis_bytes"].hset(
+        INDEX_KEY, mapping={"version": version, "data": IVFIndex.build(keys, vectors).to_bytes()}
+    )
+    current_app.logger.info(f"Rebuilt channel catalog index with {len(keys)} channels")
@@ -1,6 +1,6 @@
 from datetime import timedelta
 from bson import ObjectId
-import json
+import json, secrets, time
 
 def get_redis_cache(redis, key):
     """
@@ -19,6 +19,82 @@ def set_redis_cache(redis, key, value, ttl_seconds=600):
     """
     redis.setex(key, timedelta(seconds=ttl_seconds), json.dumps(value))
 
+# Deletes the lock only if this worker still owns it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+def get_or_set_redis_cache(redis, key, compute, ttl_seconds=600, stale_ttl_seconds=86400,
+                           lock_seconds=30, wait_seconds=3.0, poll_seconds=0.1):
+    """
+    Cache-aside with cross-worker request coalescing (singleflight).
+    On a miss only the worker holding `lock:<key>` runs `compute` and fills the cache.
+    Other workers wait for that result; after `wait_seconds` they fall back to the
+    last value kept under `stale:<key>`. With no stale value (a cold miss) they keep
+    waiting, up to `lock_seconds`, and take over the lock if the holder gives up, so
+    only one worker computes at a time. A `compute` result of None is returned but
+    not cached.
+    """
+    cached = get_redis_cache(redis, key)
+    if cached is not None:
+        return cached
+
+    lock_key = f"lock:{key}"
+    token = secrets.token_hex(8)
+    try:
+        acquired = bool(redis.set(lock_key, token, nx=True, ex=lock_seconds))
+    except Exception:
+        acquired = False
+
+    if not acquired:
+        started = time.monotonic()
+        checked_stale = False
+        while time.monotonic() - started < lock_seconds:
+            time.sleep(poll_seconds)
+            cached = get_redis_cache(redis, key)
+            if cached is not None:
+                return cached
+            try:
+                lock_free = not redis.exists(lock_key)
+            except Exception:
+                break
+
+            if not checked_stale and (lock_free or time.monotonic() - started >= wait_seconds):
+                stale = get_redis_cache(redis, f"stale:{key}")
+                if stale is not None:
+                    return stale
+                checked_stale = True
+
+            # The holder finished without a cacheable result or its lock expired
+            if lock_free:
+                try:
+                    acquired = bool(redis.set(lock_key, token, nx=True, ex=lock_seconds))
+                except Exception:
+                    break
+                if acquired:
+                    break
+
+        if not acquired and not checked_stale:
+            stale = get_redis_cache(redis, f"stale:{key}")
+            if stale is not None:
+                return stale
+
+    try:
+        value = compute()
+        if value is not None:
+            set_redis_cache(redis, key, value, ttl_seconds)
+            set_redis_cache(redis, f"stale:{key}", value, stale_ttl_seconds)
+        return value
+    finally:
+        if acquired:
+            try:
+                redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception:
+                pass
+
 def find_user_channel(mongo, user_id, channel_id):
     """
     Return the matching channel object from a user's `channels` array.
@@ -0,0 +1,85 @@
+import numpy as np
+import hashlib
+import re
+import threading
+from openai import OpenAI
+
+# Embedding backends share a batch-first interface:
+#   model_id               identifies the vector space; vectors from different ids don't mix
+#   remote                 True if calls are slow enough to be worth micro-batching
+#   embed_batch(texts)     one float32 vector per text, in order
+
+class OpenAIBackend:
+    remote = True
+
+    def __init__(self, api_key, model="text-embedding-3-small", dimensions=None):
+        self.api_key = api_key
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.model = model
+        # text-embedding-3 models can return shortened vectors
+        self.dimensions = dimensions
+        self.model_id = f"{model}@{dimensions}" if dimensions else model
+
+    @property
+    def client(self):
+        # Created on first use, so a missing key fails embed calls rather than startup.
+        # One client for the process: its connection pool is reused across calls
+        with self._client_lock:
+            if self._client is None:
+                self._client = OpenAI(api_key=self.api_key)
+            return self._client
+
+    def embed_batch(self, texts):
+        options = {"dimensions": self.dimensions} if self.dimensions else {}
+        response = self.client.embeddings.create(model=self.model, input=list(texts), **options)
+
+        vectors = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = np.asarray(item.embedding, dtype=np.float32)
+        return vectors
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+class HashingBackend:
+    """
+    Deterministic, offline embeddings from signed feature hashing of words,
+    word bigrams and character trigrams. Far weaker than a learned model, but
+    free, instant and stable across runs: good for load tests and as a
+    network-free relevance signal.
+    """
+    remote = False
+
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+        self.model_id = f"local-hashing@{dimensions}"
+
+    def _features(self, text):
+        words = _TOKEN_RE.findall(text.lower())
+        features = [(w, 1.0) for w in words]
+        features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"#{w}#"
+            features += [(padded[i:i + 3], 0.25) for i in range(len(padded) - 2)]
+        return features
+
+    def _embed_one(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dimensions] += sign * weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed_batch(self, texts):
+        return [self._embed_one(t) for t in texts]
+
+BACKENDS = {"openai", "local"}
+
+def create_backend(name, api_key=None, dimensions=None):
+    if name == "local":
+        return HashingBackend(dimensions or 512)
+    if name == "openai":
+        return OpenAIBackend(api_key, dimensions=dimensions)
+    raise ValueError(f"Unknown embedding backend: {name} (expected one of {sorted(BACKENDS)})")
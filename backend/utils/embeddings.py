@@ -1,26 +1,200 @@
 from flask import current_app
+from datetime import timedelta
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import numpy as np
-from openai import OpenAI, OpenAIError
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from openai import OpenAIError
+from utils.embedding_backends import create_backend
+from utils.vector_codec import encode, decode
 
-def embed_text(text):
+DEFAULT_CODEC = "float16"
+
+# Concurrent embed calls are held this long so they can share one API request,
+# unless enough inputs are queued to flush right away
+BATCH_WINDOW_MS = 5
+MAX_BATCH_INPUTS = 512
+EMBED_TIMEOUT_SECONDS = 30
+
+# Vectors are content-addressed, so they never go stale; the TTL only lets
+# Redis' volatile-lru policy evict the cold ones. Every hit extends it.
+EMBEDDING_TTL_SECONDS = 30 * 86400
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+def _embedding_key(model, text):
+    digest = hashlib.sha1(normalize_text(text).encode()).hexdigest()
+    return f"emb:{model}:{digest}"
+
+def embedding_codec():
+    return current_app.config.get("EMBEDDING_CODEC") or DEFAULT_CODEC
+
+def _load_cached(keys):
+    """
+    Return {key: vector} for the keys in the embedding cache, refreshing their TTL.
+    Vectors are stored in the configured compact encoding through the binary Redis client.
+    """
+    redis = current_app.extensions["redis_bytes"]
     try:
-        openai_client = OpenAI(api_key=current_app.config["OPENAI_API_KEY"])
-        if isinstance(text, str):
-            text = [text]
+        raw = redis.mget(keys)
+        found = {key: decode(val) for key, val in zip(keys, raw) if val}
+        if found:
+            pipe = redis.pipeline()
+            for key in found:
+                pipe.expire(key, EMBEDDING_TTL_SECONDS)
+            pipe.execute()
+        return found
+    except Exception as e:
+        current_app.logger.warning(f"Embedding cache read failed: {e}")
+        return {}
+
+def _store_cached(vectors):
+    redis = current_app.extensions["redis_bytes"]
+    codec = embedding_codec()
+    try:
+        pipe = redis.pipeline()
+        for key, vector in vectors.items():
+            pipe.setex(key, timedelta(seconds=EMBEDDING_TTL_SECONDS), encode(vector, codec))
+        pipe.execute()
+    except Exception as e:
+        current_app.logger.warning(f"Embedding cache write failed: {e}")
+
+class EmbeddingService:
+    """
+    Shared embedding backend that coalesces concurrent calls.
+    Request and executor threads queue their texts; a single flush thread sends
+    everything queued within the batch window to the backend as one batch
+    and hands each caller its slice of the result. Local backends are called directly.
+    """
+
+    def __init__(self, backend, window_ms=BATCH_WINDOW_MS, max_inputs=MAX_BATCH_INPUTS):
+        self.backend = backend
+        # Vectors from different backends, models or widths aren't comparable, so stored ones carry this
+        self.model_id = backend.model_id
+        self.window = window_ms / 1000
+        self.max_inputs = max_inputs
+        self.logger = logging.getLogger(__name__)
+        self._pending = []  # (texts, Future)
+        self._pending_inputs = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def embed(self, texts, timeout=EMBED_TIMEOUT_SECONDS):
+        """
+        Return one float32 vector per text, in order. Raises OpenAIError on API failure.
+        """
+        if not self.backend.remote:
+            return self.backend.embed_batch(list(texts))
+
+        future = Future()
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily so each forked worker gets its own thread
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((list(texts), future))
+            self._pending_inputs += len(texts)
+            self._cond.notify()
+        return future.result(timeout=timeout)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.window
+            while self._pending_inputs < self.max_inputs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._pending and (not batch or size + len(self._pending[0][0]) <= self.max_inputs):
+                texts, future = self._pending.pop(0)
+                batch.append((texts, future))
+                size += len(texts)
+            self._pending_inputs -= size
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._flush(batch)
+            except Exception as e:
+                self.logger.error(f"Embedding batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _flush(self, batch):
+        # Callers often embed the same strings (queries, niches), so send each once
+        unique = list(dict.fromkeys(t for texts, _ in batch for t in texts))
+        by_text = dict(zip(unique, self.backend.embed_batch(unique)))
+
+        for texts, future in batch:
+            future.set_result([by_text[t] for t in texts])
+
+def init_embedding_service(app):
+    backend = create_backend(
+        app.config.get("EMBEDDING_BACKEND") or "openai",
+        api_key=app.config.get("OPENAI_API_KEY"),
+        dimensions=app.config.get("EMBEDDING_DIMENSIONS"),
+    )
+    service = EmbeddingService(backend)
+    app.extensions["embeddings"] = service
+    return service
+
+def get_embedding_service():
+    service = current_app.extensions.get("embeddings")
+    if service is None:
+        service = init_embedding_service(current_app)
+    return service
+
+def embedding_model_id():
+    return get_embedding_service().model_id
+
+def embed_text(text):
+    """
+    Embed a string (returns one vector) or a list of strings (returns a list in input order).
+    Texts already in the cache are served from Redis; the rest go to OpenAI through the
+    shared batching service, possibly in the same request as other callers' texts.
+    """
+    single = isinstance(text, str)
+    texts = [text] if single else list(text)
+    if not texts:
+        return []
+
+    keys = [_embedding_key(embedding_model_id(), t) for t in texts]
+    vectors = _load_cached(list(dict.fromkeys(keys)))
+
+    # One API input per distinct uncached text
+    missing = {}
+    for key, t in zip(keys, texts):
+        if key not in vectors and key not in missing:
+            missing[key] = normalize_text(t)
+
+    if missing:
+        try:
+            embedded = get_embedding_service().embed(list(missing.values()))
+        except (OpenAIError, FutureTimeoutError) as e:
+            current_app.logger.error(f"OpenAI embedding error: {e}")
+            return None
 
-        response = openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
+        fresh = dict(zip(missing, embedded))
+        _store_cached(fresh)
+        vectors.update(fresh)
 
-        embeddings = [np.array(item.embedding) for item in response.data]
-        return embeddings[0] if len(embeddings) == 1 else embeddings
-    except OpenAIError as e:
-        current_app.logger.error(f"OpenAI embedding error: {e}")
-        return None
+    embeddings = [vectors[key] for key in keys]
+    return embeddings[0] if single else embeddings
 
 def cosine_similarity(vec1, vec2):
     dot_product = np.dot(vec1, vec2)
     norm1 = np.linalg.norm(vec1)
     norm2 = np.linalg.norm(vec2)
-    return dot_product / (norm1 * norm2) if norm1 != 0 and norm2 != 0 else 0.0
\ No newline at end of file
+    return float(dot_product / (norm1 * norm2)) if norm1 != 0 and norm2 != 0 else 0.0
@@ -0,0 +1,43 @@
+from flask import current_app
+import secrets
+import time
+from utils.db import get_redis_cache, set_redis_cache
+
+# Status of background jobs started by a request, polled by the client
+# (Redis `job:<job_id>`, JSON):
+#   kind        what the job does, e.g. "add_channel"
+#   userId      owner; other users can't read it
+#   status      queued | running | done | failed
+#   step        current stage, for progress display
+#   result      set when done
+#   error       message when failed
+#   updatedAt   unix time
+
+JOB_TTL_SECONDS = 3600
+
+def _job_key(job_id):
+    return f"job:{job_id}"
+
+def create_job(kind, user_id, **fields):
+    job_id = secrets.token_urlsafe(12)
+    job = {"kind": kind, "userId": user_id, "status": "queued", "step": None, **fields, "updatedAt": time.time()}
+    set_redis_cache(current_app.extensions["redis"], _job_key(job_id), job, JOB_TTL_SECONDS)
+    return job_id
+
+def update_job(job_id, **fields):
+    """
+    Merge `fields` into the job. Only the job's own worker writes to it.
+    """
+    redis = current_app.extensions["redis"]
+    job = get_redis_cache(redis, _job_key(job_id)) or {}
+    job.update(fields, updatedAt=time.time())
+    set_redis_cache(redis, _job_key(job_id), job, JOB_TTL_SECONDS)
+
+def get_job(job_id, user_id):
+    """
+    The job if it exists and belongs to `user_id`, else None.
+    """
+    job = get_redis_cache(current_app.extensions["redis"], _job_key(job_id))
+    if not job or job.get("userId") != user_id:
+        return None
+    return job
@@ -0,0 +1,71 @@
+import json
+
+class JSONArrayStream:
+    """
+    Incremental parser for a JSON array that arrives in pieces (e.g. a streamed
+    LLM reply). feed() returns the elements completed by each new piece, so the
+    caller can use every element as soon as it closes. Anything before the
+    opening bracket, such as a ```json fence, is skipped.
+    Raises json.JSONDecodeError on a malformed element.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._depth = 0           # nesting below the top-level array
+        self._in_string = False
+        self._escaped = False
+        self._item = []
+
+    def _complete(self):
+        text = "".join(self._item).strip()
+        self._item = []
+        return json.loads(text)
+
+    def _flush(self, items):
+        # Numbers, literals, or nothing after a string or container already emitted
+        if "".join(self._item).strip():
+            items.append(self._complete())
+        self._item = []
+
+    def feed(self, text):
+        items = []
+        for ch in text:
+            if self.finished:
+                break
+            if not self.started:
+                self.started = ch == "["
+                continue
+
+            if self._in_string:
+                self._item.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        items.append(self._complete())
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._item.append(ch)
+            elif ch in "[{":
+                self._depth += 1
+                self._item.append(ch)
+            elif ch in "]}":
+                if self._depth == 0:
+                    self._flush(items)
+                    self.finished = True
+                    continue
+                self._depth -= 1
+                self._item.append(ch)
+                if self._depth == 0:
+                    items.append(self._complete())
+            elif ch == "," and self._depth == 0:
+                self._flush(items)
+            else:
+                self._item.append(ch)
+        return items
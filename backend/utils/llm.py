@@ -0,0 +1,84 @@
+from flask import current_app
+from openai import OpenAI
+import threading
+import time
+from utils.usage import current_caller, record_llm_call
+
+# Chat completions go through one client per process (its connection pool is reused)
+# and every response's token usage is billed to the current caller (utils.usage).
+#
+# Prompts keep all static instructions in the system message and the per-request
+# data in a short user message after it. The provider only caches prompt prefixes
+# of 1024+ tokens; today's system prompts are shorter (roughly 400-850 tokens), so
+# cached_tokens stays at 0 until one of them grows past that.
+
+_client_lock = threading.Lock()
+
+def init_llm_client(app):
+    client = OpenAI(api_key=app.config.get("OPENAI_API_KEY"))
+    app.extensions["openai"] = client
+    return client
+
+def get_llm_client():
+    # Created on the first completion, so the app starts without an OpenAI key
+    with _client_lock:
+        client = current_app.extensions.get("openai")
+        if client is None:
+            client = init_llm_client(current_app)
+        return client
+
+def track_llm_call(model, latency_ms, usage=None):
+    try:
+        record_llm_call(current_app.extensions["redis"], current_caller(), model, latency_ms, usage)
+    except Exception as e:
+        current_app.logger.warning(f"Failed to record LLM call metrics: {e}")
+
+def chat_completion(model, system, user, **options):
+    """
+    Run one chat completion with a static `system` prefix and a variable `user`
+    message, recording its latency and token usage. Returns the response.
+    """
+    started = time.monotonic()
+    try:
+        response = get_llm_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            **options
+        )
+    except Exception:
+        track_llm_call(model, (time.monotonic() - started) * 1000)
+        raise
+    track_llm_call(model, (time.monotonic() - started) * 1000, response.usage)
+    return response
+
+def stream_chat_completion(model, system, user, **options):
+    """
+    Like chat_completion(), but yields the reply text piece by piece as it is
+    generated. Usage is recorded when the stream ends; a stream abandoned early
+    counts as an error.
+    """
+    started = time.monotonic()
+    usage = None
+    try:
+        stream = get_llm_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+            **options
+        )
+        with stream:
+            for chunk in stream:
+                # The last chunk has usage and no choices
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    finally:
+        track_llm_call(model, (time.monotonic() - started) * 1000, usage)
@@ -0,0 +1,69 @@
+from flask import current_app
+from datetime import datetime, timezone
+from bson.binary import Binary
+import hashlib
+from utils.embeddings import embed_text, embedding_model_id, embedding_codec
+from utils.vector_codec import encode, decode
+from extensions import mongo
+
+# Embeddings of a saved channel's analysis (`profile_embeddings` collection):
+#   _id               "<user_id>:<channel_id>"
+#   textHash          hash of the model and the analysed niche and attention market
+#   niche             encoded vector (utils.vector_codec)
+#   attentionMarket   encoded vector
+#   updatedAt
+# A hash mismatch means the analysis changed, and the vectors are recomputed.
+
+def _doc_id(user_id, channel_id):
+    return f"{user_id}:{channel_id}"
+
+def profile_texts(profile):
+    return profile.get("analyzedNiche", "unknown"), profile.get("analyzedAttentionMarket", "")
+
+def _text_hash(profile):
+    niche, attention = profile_texts(profile)
+    return hashlib.sha1(f"{embedding_model_id()}\n{niche}\n{attention}".encode()).hexdigest()
+
+def store_profile_embeddings(user_id, profile, niche_vector, attention_vector):
+    codec = embedding_codec()
+    try:
+        mongo.db.profile_embeddings.replace_one(
+            {"_id": _doc_id(user_id, profile["channelId"])},
+            {
+                "textHash": _text_hash(profile),
+                "niche": Binary(encode(niche_vector, codec)),
+                "attentionMarket": Binary(encode(attention_vector, codec)),
+                "updatedAt": datetime.now(timezone.utc),
+            },
+            upsert=True
+        )
+    except Exception as e:
+        current_app.logger.warning(f"Failed to store profile embeddings: {e}")
+
+def embed_profile(user_id, profile, extra_texts=()):
+    """
+    Return (niche_vector, attention_vector, [vectors for extra_texts]) for a saved channel.
+    Stored vectors are used while the analysis is unchanged; otherwise they are
+    recomputed in the same embedding call as `extra_texts` and stored again.
+    Returns None if embedding fails.
+    """
+    extra_texts = list(extra_texts)
+    doc = mongo.db.profile_embeddings.find_one({"_id": _doc_id(user_id, profile["channelId"])})
+
+    if doc and doc.get("textHash") == _text_hash(profile):
+        extra = embed_text(extra_texts) if extra_texts else []
+        if extra is None:
+            return None
+        niche = decode(doc["niche"])
+        attention = decode(doc["attentionMarket"])
+        return niche, attention, extra
+
+    vectors = embed_text([*profile_texts(profile), *extra_texts])
+    if vectors is None:
+        return None
+    niche, attention, extra = vectors[0], vectors[1], vectors[2:]
+    store_profile_embeddings(user_id, profile, niche, attention)
+    return niche, attention, extra
+
+def delete_profile_embeddings(user_id, channel_id):
+    mongo.db.profile_embeddings.delete_one({"_id": _doc_id(user_id, channel_id)})
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import hashlib
+import random
+
+# YouTube Data API quotas reset at midnight Pacific time
+PACIFIC = ZoneInfo("America/Los_Angeles")
+
+DEFAULT_DAILY_QUOTA = 10000
+
+# Unit cost per API method (YouTube Data API v3 quota calculator)
+QUOTA_COSTS = {
+    "youtube.search.list": 100,
+    "youtube.channels.list": 1,
+    "youtube.playlistItems.list": 1,
+    "youtube.videos.list": 1,
+}
+
+QUOTA_ERROR_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+class QuotaExhaustedError(Exception):
+    """Raised when every configured API key has used up its daily quota."""
+
+def quota_cost(method_id):
+    return QUOTA_COSTS.get(method_id, 1)
+
+def quota_day(now=None):
+    """
+    Return the current quota day (YYYY-MM-DD) in Pacific time.
+    """
+    now = now or datetime.now(PACIFIC)
+    return now.astimezone(PACIFIC).strftime("%Y-%m-%d")
+
+def seconds_until_reset(now=None):
+    now = (now or datetime.now(PACIFIC)).astimezone(PACIFIC)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((midnight - now).total_seconds()))
+
+def key_id(api_key):
+    """
+    Short stable identifier for an API key, so raw keys never land in Redis.
+    """
+    return hashlib.sha1(api_key.encode()).hexdigest()[:12]
+
+def _ledger_key(day):
+    return f"yt_quota:{day}"
+
+def _exhausted_key(day):
+    return f"yt_quota_exhausted:{day}"
+
+def charge_key(redis, api_key, units):
+    """
+    Add `units` to the key's ledger for the current quota day.
+    """
+    ledger = _ledger_key(quota_day())
+    pipe = redis.pipeline()
+    pipe.hincrby(ledger, key_id(api_key), units)
+    pipe.expire(ledger, seconds_until_reset() + 3600)
+    pipe.execute()
+
+def mark_exhausted(redis, api_key):
+    """
+    Skip this key until the next Pacific-midnight reset.
+    """
+    exhausted = _exhausted_key(quota_day())
+    pipe = redis.pipeline()
+    pipe.sadd(exhausted, key_id(api_key))
+    pipe.expire(exhausted, seconds_until_reset() + 60)
+    pipe.execute()
+
+def get_quota_usage(redis, api_keys, daily_quota=DEFAULT_DAILY_QUOTA):
+    """
+    Return {key_id: {"used", "remaining", "exhausted"}} for the current quota day.
+    """
+    day = quota_day()
+    pipe = redis.pipeline()
+    pipe.hgetall(_ledger_key(day))
+    pipe.smembers(_exhausted_key(day))
+    ledger, exhausted = pipe.execute()
+
+    usage = {}
+    for key in api_keys:
+        kid = key_id(key)
+        used = int(ledger.get(kid, 0))
+        usage[kid] = {
+            "used": used,
+            "remaining": max(0, daily_quota - used),
+            "exhausted": kid in exhausted or used >= daily_quota,
+        }
+    return usage
+
+def pick_key(redis, api_keys, daily_quota=DEFAULT_DAILY_QUOTA, exclude=()):
+    """
+    Pick the non-exhausted key with the most budget left, or None if all are spent.
+    Ties are broken randomly so workers don't all pile onto the same key.
+    """
+    usage = get_quota_usage(redis, api_keys, daily_quota)
+    candidates = [
+        k for k in api_keys
+        if k not in exclude and not usage[key_id(k)]["exhausted"]
+    ]
+    if not candidates:
+        return None
+
+    best = max(usage[key_id(k)]["remaining"] for k in candidates)
+    return random.choice([k for k in candidates if usage[key_id(k)]["remaining"] == best])
@@ -1,13 +1,20 @@
 from flask import current_app
 from bson import ObjectId
 from datetime import datetime, timezone, timedelta
-from utils.youtube_api import get_youtube_client, fetch_channel_videos
-from utils.parser import extract_main_topic, chunkify
-import statistics, isodate, json
-from dateutil import parser as date_parser
+from utils.youtube_api import (
+    get_youtube_client,
+    batch_channel_uploads,
+    fetch_channels_metadata,
+)
+from utils.channel import analyze_channels_insights
+from utils.video_cache import get_videos
+from utils.parser import extract_main_topic
+import statistics, json
 from utils.db import set_redis_cache
+from utils.usage import tracked
 from extensions import mongo
 
+@tracked("find_outliers_for_channel")
 def find_outliers_for_channel(user_id: str, user_email: str, user_channel: dict):
     yt = get_youtube_client()
     channel_id = user_channel.get("channelId")
@@ -32,6 +39,7 @@ def find_outliers_for_channel(user_id: str, user_email: str, user_channel: dict)
             res = yt.search().list(
                 q=kw, type="video", part="snippet", maxResults=50,
                 videoDuration="medium", publishedAfter=published_after, order="viewCount",
+                fields="items/id/videoId",
             ).execute()
             search_results.extend(res.get("items", []))
         except Exception as e:
@@ -45,80 +53,57 @@ def find_outliers_for_channel(user_id: str, user_email: str, user_channel: dict)
             deduped.append(item)
 
     video_ids = [item["id"]["videoId"] for item in deduped]
-    detailed_videos = []
-    for chunk in chunkify(video_ids, 50):
-        stats_res = yt.videos().list(id=",".join(chunk), part="snippet,statistics,contentDetails").execute()
-        for item in stats_res.get("items", []):
-            stats, snippet = item.get("statistics", {}), item["snippet"]
-            view_count = int(stats.get("viewCount", 0)) if stats.get("viewCount") else 0
-            content = item.get("contentDetails", {})
-
-            iso_duration = content.get("duration") or "PT0S"
-            duration = isodate.parse_duration(iso_duration)
-            total_seconds = int(duration.total_seconds())
-            mins, secs = divmod(total_seconds, 60)
-            hrs, mins = divmod(mins, 60)
-            length_str = f"{hrs}:{mins:02}:{secs:02}" if hrs > 0 else f"{mins}:{secs:02}"
-
-            detailed_videos.append({
-                "videoId": item["id"],
-                "title": snippet["title"],
-                "publishedAt": snippet["publishedAt"],
-                "viewCount": view_count,
-                "channelId": snippet["channelId"],
-                "channelTitle": snippet["channelTitle"],
-                "length": length_str,
-            })
-
-    detailed_videos = [v for v in detailed_videos if v["channelId"] not in user_channel_ids]
+    detailed_videos = list(get_videos(yt, video_ids).values())
+    detailed_videos = [v for v in detailed_videos if v.channel_id not in user_channel_ids]
+
+    # Resolve every candidate channel's recent uploads in batched calls
+    candidate_channel_ids = list(dict.fromkeys(v.channel_id for v in detailed_videos))
+    playlists = batch_channel_uploads(yt, candidate_channel_ids, max_results=15)
+
+    recent_ids_by_channel = {
+        ch_id: [
+            item["contentDetails"]["videoId"]
+            for item in items
+            if item.get("contentDetails", {}).get("videoId")
+        ]
+        for ch_id, items in playlists.items()
+    }
+
+    recent_details = get_videos(yt, [vid for ids in recent_ids_by_channel.values() for vid in ids])
+
+    median_by_channel = {}
+    for ch_id, recent_video_ids in recent_ids_by_channel.items():
+        recent_views = []
+        for rvid in recent_video_ids:
+            rv = recent_details.get(rvid)
+            if rv and rv.view_count > 0:
+                recent_views.append(rv.view_count)
+        median_by_channel[ch_id] = statistics.median(recent_views) if recent_views else 0
 
     found_outliers = []
 
     for vid in detailed_videos:
-        candidate_channel_id = vid["channelId"]
-
-        try:
-            chan_info = yt.channels().list(part="contentDetails", id=candidate_channel_id).execute()
-            chan_items = chan_info.get("items", [])
-            if not chan_items:
-                continue
-
-            uploads_id = chan_items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
-            playlist_items = yt.playlistItems().list(
-                part="contentDetails", playlistId=uploads_id, maxResults=15
-            ).execute()
-            recent_video_ids = [item["contentDetails"]["videoId"] for item in playlist_items.get("items", [])]
-
-            recent_views = []
-            for rchunk in chunkify(recent_video_ids, 50):
-                recent_res = yt.videos().list(id=",".join(rchunk), part="statistics").execute()
-                for rvid in recent_res.get("items", []):
-                    rv = int(rvid.get("statistics", {}).get("viewCount", 0))
-                    if rv > 0:
-                        recent_views.append(rv)
-
-            median_views = statistics.median(recent_views) if recent_views else 0
-            outlierScore = vid["viewCount"] / median_views if median_views > 0 else 0
-
-            if outlierScore >= 2.0 and vid["viewCount"] >= 5000:
-                outlier_doc = {
-                    "userId": str(user_id),
-                    "videoId": vid["videoId"],
-                    "channelId": vid["channelId"],
-                    "title": vid["title"],
-                    "channelTitle": vid["channelTitle"],
-                    "outlierScore": round(outlierScore, 2),
-                    "views": vid["viewCount"],
-                    "publishedAt": vid["publishedAt"],
-                    "createdAt": datetime.now(timezone.utc).isoformat(),
-                    "length": vid["length"]
-                }
-                found_outliers.append(outlier_doc)
+        candidate_channel_id = vid.channel_id
+        if candidate_channel_id not in median_by_channel:
+            continue
 
-        except Exception as e:
-            current_app.logger.error(
-                f"[{user_email}] Error analyzing candidate channel {candidate_channel_id}: {e}"
-            )
+        median_views = median_by_channel[candidate_channel_id]
+        outlierScore = vid.view_count / median_views if median_views > 0 else 0
+
+        if outlierScore >= 2.0 and vid.view_count >= 5000:
+            outlier_doc = {
+                "userId": str(user_id),
+                "videoId": vid.video_id,
+                "channelId": vid.channel_id,
+                "title": vid.title,
+                "channelTitle": vid.channel_title,
+                "outlierScore": round(outlierScore, 2),
+                "views": vid.view_count,
+                "publishedAt": vid.published_at,
+                "createdAt": datetime.now(timezone.utc).isoformat(),
+                "length": vid.length
+            }
+            found_outliers.append(outlier_doc)
 
     redis = current_app.extensions["redis"]
     set_redis_cache(redis, redis_key, found_outliers, ttl_seconds=86400)
@@ -139,16 +124,16 @@ def refresh_all_outliers_for_all_users():
 
 MAX_NOTIFICATIONS = 20  # per user-channel in Redis
 
+@tracked("check_competitors_for_all_users")
 def check_competitors_for_all_users():
     yt = get_youtube_client()
     redis = current_app.extensions["redis"]
 
     users = list(mongo.db.users.find({}))
 
+    # Collect every (user, competitor) pair first so each competitor is fetched once
+    checks = []
     for user in users:
-        user_id = user["_id"]
-        email = user.get("email", "unknown")
-
         if not user.get("channels") or not user.get("notificationsEnabled", True):
             continue
 
@@ -160,49 +145,84 @@ def check_competitors_for_all_users():
             lists = list(mongo.db.competitor_lists.find({"channelId": selected_channel_id}))
             for comp_list in lists:
                 competitors = list(mongo.db.competitors.find({"listId": comp_list["listId"]}))
-
                 for comp in competitors:
-                    comp_channel_id = comp["competitorChannelId"]
-                    last_checked = comp.get("lastChecked")
-                    uploads_since = datetime.min.replace(tzinfo=timezone.utc) if not last_checked else last_checked
-
-                    try:
-                        chan_info = yt.channels().list(
-                            part="contentDetails",
-                            id=comp_channel_id
-                        ).execute()
-
-                        items = chan_info.get("items", [])
-                        if not items:
-                            continue  # skip invalid or deleted channels
-
-                        uploads_id = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
-                        videos_res = fetch_channel_videos(yt, uploads_id, 1)
-                        videos = videos_res.get("videos") if videos_res else []
-                        latest_video = videos[0] if videos else None
-
-                        if latest_video:
-                            published_at = date_parser.parse(latest_video["publishedAt"]).astimezone(timezone.utc)
-                            if published_at > uploads_since:
-                                # Redis key format: notifs:<user_id>:<channel_id>
-                                redis_key = f"notifs:{str(user_id)}:{comp_channel_id}"
-                                timestamp = datetime.now(timezone.utc).isoformat()
-
-                                notif_data = {
-                                    "message": f"New video from {comp.get('title', 'a competitor')}: {latest_video['title']}",
-                                    "timestamp": timestamp,
-                                    "channelId": comp_channel_id,
-                                    "read": False,
-                                }
-
-                                # Add to Redis and trim to latest N
-                                redis.lpush(redis_key, json.dumps(notif_data))
-                                redis.ltrim(redis_key, 0, MAX_NOTIFICATIONS - 1)
-
-                                # Update competitor last checked timestamp
-                                mongo.db.competitors.update_one(
-                                    {"_id": comp["_id"]},
-                                    {"$set": {"lastChecked": datetime.now(timezone.utc)}}
-                                )
-                    except Exception as e:
-                        current_app.logger.error(f"Error checking channel {comp_channel_id} for user {email}: {e}")
+                    checks.append((user, comp))
+
+    if not checks:
+        return
+
+    comp_channel_ids = list(dict.fromkeys(comp["competitorChannelId"] for _, comp in checks))
+    playlists = batch_channel_uploads(yt, comp_channel_ids, max_results=1)
+
+    latest_id_by_channel = {}
+    for comp_channel_id, items in playlists.items():
+        if items and items[0].get("contentDetails", {}).get("videoId"):
+            latest_id_by_channel[comp_channel_id] = items[0]["contentDetails"]["videoId"]
+
+    latest_details = get_videos(yt, latest_id_by_channel.values())
+
+    for user, comp in checks:
+        user_id = user["_id"]
+        email = user.get("email", "unknown")
+        comp_channel_id = comp["competitorChannelId"]
+        last_checked = comp.get("lastChecked")
+        if last_checked and last_checked.tzinfo is None:
+            # PyMongo hands back naive UTC datetimes
+            last_checked = last_checked.replace(tzinfo=timezone.utc)
+        uploads_since = datetime.min.replace(tzinfo=timezone.utc) if not last_checked else last_checked
+
+        try:
+            latest_video = latest_details.get(latest_id_by_channel.get(comp_channel_id))
+            if not latest_video:
+                continue  # skip invalid or deleted channels, or failed fetches
+
+            published_at = latest_video.published
+            if published_at and published_at > uploads_since:
+                # Redis key format: notifs:<user_id>:<channel_id>
+                redis_key = f"notifs:{str(user_id)}:{comp_channel_id}"
+                timestamp = datetime.now(timezone.utc).isoformat()
+
+                notif_data = {
+                    "message": f"New video from {comp.get('title', 'a competitor')}: {latest_video.title}",
+                    "timestamp": timestamp,
+                    "channelId": comp_channel_id,
+                    "read": False,
+                }
+
+                # Add to Redis and trim to latest N
+                redis.lpush(redis_key, json.dumps(notif_data))
+                redis.ltrim(redis_key, 0, MAX_NOTIFICATIONS - 1)
+
+                # Update competitor last checked timestamp
+                mongo.db.competitors.update_one(
+                    {"_id": comp["_id"]},
+                    {"$set": {"lastChecked": datetime.now(timezone.utc)}}
+                )
+        except Exception as e:
+            current_app.logger.error(f"Error checking channel {comp_channel_id} for user {email}: {e}")
+
+@tracked("preanalyze_competitors")
+def preanalyze_competitors():
+    """
+    Warm the shared insights cache for every tracked competitor, so opening their
+    insights doesn't wait on the LLM. Uncached channels are classified in batches.
+    """
+    yt = get_youtube_client()
+    channel_ids = mongo.db.competitors.distinct("competitorChannelId")
+
+    # Same inputs as the insights route (description, 5 newest uploads), so the
+    # cache entries line up; fetched in batches instead of per competitor
+    metadata = fetch_channels_metadata(yt, channel_ids)
+    uploads = {
+        ch: [item["contentDetails"]["videoId"] for item in items]
+        for ch, items in batch_channel_uploads(yt, list(metadata), max_results=5).items()
+    }
+    videos = get_videos(yt, [vid for video_ids in uploads.values() for vid in video_ids])
+    channels = [
+        (meta["description"], [videos[vid].to_dict() for vid in uploads.get(ch, []) if vid in videos])
+        for ch, meta in metadata.items()
+    ]
+
+    results = analyze_channels_insights(channels)
+    analyzed = sum(1 for r in results if r.get("analyzedNiche", "Unknown") != "Unknown")
+    current_app.logger.info(f"Pre-analyzed {analyzed}/{len(channel_ids)} competitor channels")
@@ -70,6 +70,15 @@ def auth_and_csrf_required(f):
         return f(data, *args, **kwargs)
     return decorated
 
+def admin_required(f):
+    @wraps(f)
+    @auth_and_csrf_required
+    def decorated(data, *args, **kwargs):
+        if data.get("user_id") not in current_app.config.get("ADMIN_USER_IDS", []):
+            return jsonify({"error": "Forbidden"}), 403
+        return f(data, *args, **kwargs)
+    return decorated
+
 def is_strong_password(password):
     return (
         len(password) >= 8 and
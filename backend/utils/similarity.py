@@ -0,0 +1,127 @@
+import numpy as np
+import io
+from utils.vector_codec import quantize_int8
+
+def normalize_rows(vectors):
+    """
+    Stack vectors into a float32 matrix with unit-length rows (zero rows stay zero),
+    so cosine similarity becomes a plain dot product.
+    """
+    # Copy: cached vectors are read-only views over Redis bytes
+    matrix = np.array(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def select(scores, k=None, threshold=None):
+    """
+    Indices of the best scores, highest first, keeping at most `k` and only
+    those >= `threshold`.
+    """
+    scores = np.asarray(scores)
+    candidates = np.flatnonzero(scores >= threshold) if threshold is not None else np.arange(len(scores))
+    if k is not None and k < len(candidates):
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+class SimilarityMatrix:
+    """
+    Candidate embeddings held as one pre-normalized float32 matrix, scored against
+    one or many queries with a single matrix product.
+    """
+
+    def __init__(self, vectors, keys=None):
+        self.matrix = normalize_rows(vectors) if len(vectors) else np.empty((0, 0), dtype=np.float32)
+        self.keys = list(keys) if keys is not None else list(range(len(self.matrix)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def scores(self, queries):
+        """
+        Cosine scores: shape (n,) for a single query vector, (q, n) for a stack of queries.
+        """
+        if not len(self):
+            return np.empty((0,), dtype=np.float32)
+        single = np.ndim(queries) == 1
+        scores = normalize_rows(queries) @ self.matrix.T
+        return scores[0] if single else scores
+
+    def search(self, query, k=None, threshold=None):
+        """
+        [(key, score)] for the best matches of one query, highest first.
+        """
+        if not len(self):
+            return []
+        scores = self.scores(query)
+        return [(self.keys[i], float(scores[i])) for i in select(scores, k, threshold)]
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over cosine similarity.
+    Vectors are clustered with spherical k-means; a query only scans the rows
+    of its `nprobe` closest clusters. Rows are kept int8-quantized with a
+    per-row scale (a quarter of float32) and scored in that form.
+    Saved to and loaded from a single .npz file.
+    """
+
+    def __init__(self, keys, codes, scales, centroids, offsets):
+        self.keys = keys              # row -> key, rows grouped by cluster
+        self.codes = codes            # int8 rows, unit vector ≈ codes * scale
+        self.scales = scales          # float32 per-row scale
+        self.centroids = centroids    # unit-length float32 cluster centres
+        self.offsets = offsets        # cluster c owns rows offsets[c]:offsets[c + 1]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def dimensions(self):
+        return self.codes.shape[1] if self.codes.ndim == 2 else 0
+
+    @classmethod
+    def build(cls, keys, vectors, nlist=None, iterations=10, seed=0):
+        matrix = normalize_rows(vectors)
+        n = len(matrix)
+        nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+
+        rng = np.random.default_rng(seed)
+        centroids = matrix[rng.choice(n, nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(matrix @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = matrix[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        codes, scales = quantize_int8(matrix[order])
+        return cls(np.asarray(keys)[order], codes, scales, centroids, offsets)
+
+    def search(self, query, k=10, nprobe=8, threshold=None):
+        """
+        [(key, score)] for the approximate best matches, highest first.
+        """
+        if not len(self):
+            return []
+        q = normalize_rows(query)[0]
+        probes = select(self.centroids @ q, k=nprobe)
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes])
+        scores = (self.codes[rows].astype(np.float32) @ q) * self.scales[rows]
+        return [(str(self.keys[rows[i]]), float(scores[i])) for i in select(scores, k, threshold)]
+
+    def to_bytes(self):
+        buf = io.BytesIO()
+        np.savez(buf, keys=self.keys.astype(str), codes=self.codes, scales=self.scales,
+                 centroids=self.centroids, offsets=self.offsets)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, raw):
+        with np.load(io.BytesIO(raw), allow_pickle=False) as data:
+            return cls(data["keys"], data["codes"], data["scales"], data["centroids"], data["offsets"])
@@ -0,0 +1,76 @@
+from flask import current_app
+import time
+from utils.db import get_redis_cache, set_redis_cache
+from utils.uploads_store import fetch_uploads, SYNC_INTERVAL_SECONDS
+from utils.youtube_api import get_youtube_client
+from utils.usage import tracked
+from extensions import executor
+
+# What the title generator needs from YouTube, cached per channel
+# (Redis `title_context:<channel_id>`):
+#   recentTitles   newest long-form titles, newest first
+#   builtAt        unix time it was built
+# Built once, then served from Redis. Once older than the upload sync interval it
+# is rebuilt in the background, so new uploads show up without the request
+# waiting on YouTube.
+
+CONTEXT_VIDEOS = 15
+RECENT_TITLES = 5
+CONTEXT_TTL_SECONDS = 7 * 86400
+REFRESH_AFTER_SECONDS = SYNC_INTERVAL_SECONDS
+REFRESH_LOCK_SECONDS = 60
+
+def _context_key(channel_id):
+    return f"title_context:{channel_id}"
+
+def build_title_context(yt, channel_id):
+    """
+    Build and store the context from the channel's recent uploads.
+    Returns None if the channel doesn't exist.
+    """
+    videos_res = fetch_uploads(yt, channel_id, max_videos=CONTEXT_VIDEOS)
+    if videos_res.get("notFound"):
+        return None
+
+    context = {
+        "recentTitles": [
+            v.get("title", "")
+            for v in videos_res.get("videos", [])
+            if not v.get("isShort", False)
+        ][:RECENT_TITLES],
+        "builtAt": time.time(),
+    }
+    # A failed sync returns no videos; don't pin that for a week
+    if context["recentTitles"] or not videos_res.get("error"):
+        set_redis_cache(current_app.extensions["redis"], _context_key(channel_id), context, CONTEXT_TTL_SECONDS)
+    return context
+
+def _refresh_in_background(channel_id):
+    redis = current_app.extensions["redis"]
+    if not redis.set(f"lock:{_context_key(channel_id)}", "1", nx=True, ex=REFRESH_LOCK_SECONDS):
+        return
+
+    app = current_app._get_current_object()
+
+    @tracked("refresh_title_context")
+    def refresh():
+        with app.app_context():
+            try:
+                build_title_context(get_youtube_client(), channel_id)
+            except Exception as e:
+                app.logger.warning(f"Failed to refresh title context for {channel_id}: {e}")
+
+    executor.submit(refresh)
+
+def get_title_context(channel_id):
+    """
+    The channel's title-generation context, building it on the first request.
+    Returns None if the channel doesn't exist.
+    """
+    context = get_redis_cache(current_app.extensions["redis"], _context_key(channel_id))
+    if context is None:
+        return build_title_context(get_youtube_client(), channel_id)
+
+    if time.time() - context.get("builtAt", 0) > REFRESH_AFTER_SECONDS:
+        _refresh_in_background(channel_id)
+    return context
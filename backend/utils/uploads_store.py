@@ -0,0 +1,195 @@
+from flask import current_app
+from datetime import datetime, timezone, timedelta
+from googleapiclient.errors import HttpError
+from utils.youtube_api import resolve_uploads_id, execute_conditional
+from utils.video_cache import get_videos
+from extensions import mongo
+
+# Per-channel upload store (`channel_uploads` collection):
+#   _id                channel ID
+#   uploadsId          uploads playlist ID
+#   videoIds           known uploads, newest first
+#   latestVideoId      high-water mark: newest synced video
+#   latestPublishedAt  its publish time
+#   nextPageToken      where to resume backfilling older uploads (None once complete)
+#   syncedAt           last time the head of the playlist was checked
+
+SYNC_INTERVAL_SECONDS = 10 * 60
+PAGE_SIZE = 50
+MAX_HEAD_PAGES = 4
+MAX_STORED_VIDEOS = 500
+
+PLAYLIST_PAGE_FIELDS = "etag,nextPageToken,items/contentDetails(videoId,videoPublishedAt)"
+
+class ChannelNotFound(Exception):
+    pass
+
+def _page(yt, uploads_id, page_token=None):
+    req = yt.playlistItems().list(
+        part="contentDetails",
+        playlistId=uploads_id,
+        maxResults=PAGE_SIZE,
+        pageToken=page_token,
+        fields=PLAYLIST_PAGE_FIELDS
+    )
+    # The head page is re-checked on every sync, so send its ETag back
+    return req.execute() if page_token else execute_conditional(req)
+
+def _item_ids(resp):
+    return [
+        (item["contentDetails"]["videoId"], item["contentDetails"].get("videoPublishedAt"))
+        for item in resp.get("items", [])
+        if item.get("contentDetails", {}).get("videoId")
+    ]
+
+def _sync_head(yt, uploads_id, known_ids, min_videos):
+    """
+    Page from the newest upload until a known video is reached.
+    Returns (new (videoId, publishedAt) pairs, reached_known, next_page_token).
+    """
+    new_items, seen = [], set()
+    page_token, reached_known = None, False
+
+    for _ in range(MAX_HEAD_PAGES):
+        resp = _page(yt, uploads_id, page_token)
+        for vid, published_at in _item_ids(resp):
+            if vid in known_ids:
+                reached_known = True
+                break
+            if vid not in seen:
+                seen.add(vid)
+                new_items.append((vid, published_at))
+
+        page_token = resp.get("nextPageToken")
+        if reached_known or not page_token:
+            break
+        # Cold start: stop once there's enough, older pages are backfilled on demand
+        if not known_ids and len(new_items) >= min_videos:
+            break
+
+    return new_items, reached_known, page_token
+
+def _backfill(yt, uploads_id, video_ids, page_token, min_videos):
+    known = set(video_ids)
+    while page_token and len(video_ids) < min(min_videos, MAX_STORED_VIDEOS):
+        resp = _page(yt, uploads_id, page_token)
+        for vid, _ in _item_ids(resp):
+            if vid not in known:
+                known.add(vid)
+                video_ids.append(vid)
+        page_token = resp.get("nextPageToken")
+    return video_ids, page_token
+
+def sync_channel_uploads(yt, channel_id, min_videos=PAGE_SIZE, force=False, uploads_id=None):
+    """
+    Bring the channel's upload store up to date and return its document.
+    Only pages the playlist until it reaches already-synced uploads, and backfills
+    older uploads only when fewer than `min_videos` are stored.
+    Raises ChannelNotFound if the channel doesn't exist.
+    """
+    uploads = mongo.db.channel_uploads
+    doc = uploads.find_one({"_id": channel_id}) or {}
+    now = datetime.now(timezone.utc)
+
+    synced_at = doc.get("syncedAt")
+    if synced_at and synced_at.tzinfo is None:
+        synced_at = synced_at.replace(tzinfo=timezone.utc)
+    head_fresh = bool(synced_at) and now - synced_at < timedelta(seconds=SYNC_INTERVAL_SECONDS)
+    video_ids = list(doc.get("videoIds", []))
+    page_token = doc.get("nextPageToken")
+
+    if head_fresh and not force and (len(video_ids) >= min_videos or not page_token):
+        return doc
+
+    refreshed = uploads_id is not None
+    uploads_id = uploads_id or doc.get("uploadsId") or resolve_uploads_id(yt, channel_id)
+    if not uploads_id:
+        raise ChannelNotFound(channel_id)
+
+    try:
+        if not head_fresh or force:
+            new_items, reached_known, head_token = _sync_head(yt, uploads_id, set(video_ids), min_videos)
+            if reached_known:
+                video_ids = [vid for vid, _ in new_items] + video_ids
+            else:
+                # Cold start, or too many new uploads to bridge: start over from the head
+                video_ids = [vid for vid, _ in new_items]
+                page_token = head_token
+            if new_items:
+                doc["latestVideoId"], doc["latestPublishedAt"] = new_items[0]
+            synced_at = now
+
+        video_ids, page_token = _backfill(yt, uploads_id, video_ids, page_token, min_videos)
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+        if not refreshed:
+            # The stored or derived playlist ID may be wrong: re-resolve once through the API
+            fresh_id = resolve_uploads_id(yt, channel_id, refresh=True)
+            if not fresh_id:
+                raise ChannelNotFound(channel_id)
+            if fresh_id != uploads_id:
+                uploads.delete_one({"_id": channel_id})
+                return sync_channel_uploads(yt, channel_id, min_videos, force=True, uploads_id=fresh_id)
+        # The channel exists but its uploads playlist is empty
+        video_ids, page_token, synced_at = [], None, now
+
+    if len(video_ids) > MAX_STORED_VIDEOS:
+        video_ids = video_ids[:MAX_STORED_VIDEOS]
+        page_token = None
+
+    doc.update({
+        "_id": channel_id,
+        "uploadsId": uploads_id,
+        "videoIds": video_ids,
+        "nextPageToken": page_token,
+        "syncedAt": synced_at,
+    })
+    uploads.replace_one({"_id": channel_id}, doc, upsert=True)
+    return doc
+
+def _parse_offset(page_token):
+    try:
+        return max(0, int(page_token)) if page_token else 0
+    except (TypeError, ValueError):
+        return 0
+
+def fetch_uploads(yt_client, channel_id, max_videos=50, page_token=None):
+    """
+    Recent uploads for a channel, read from the persistent upload store.
+    `page_token` is an offset into the store, returned as `nextPageToken`.
+    """
+    offset = _parse_offset(page_token)
+
+    try:
+        doc = sync_channel_uploads(yt_client, channel_id, min_videos=offset + max_videos)
+    except ChannelNotFound:
+        return {
+            "videos": [],
+            "nextPageToken": None,
+            "error": "Channel not found",
+            "notFound": True
+        }
+    except Exception as e:
+        current_app.logger.error(f"Failed to sync uploads for {channel_id}: {e}")
+        doc = mongo.db.channel_uploads.find_one({"_id": channel_id})
+        if not doc:
+            return {
+                "videos": [],
+                "nextPageToken": None,
+                "error": str(e)
+            }
+
+    video_ids = doc.get("videoIds", [])
+    page_ids = video_ids[offset:offset + max_videos]
+    details = get_videos(yt_client, page_ids)
+
+    videos = [details[vid].to_dict() for vid in page_ids if vid in details]
+
+    next_offset = offset + len(page_ids)
+    has_more = next_offset < len(video_ids) or bool(doc.get("nextPageToken"))
+
+    return {
+        "videos": videos,
+        "nextPageToken": str(next_offset) if has_more and page_ids else None
+    }
@@ -0,0 +1,180 @@
+from flask import request, has_request_context
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from utils.quota import quota_day
+
+# Per-caller YouTube API accounting, one hash per caller per Pacific quota day:
+#   yt_usage:<day>:<caller>   calls, units, latency_ms, calls:<method>, units:<method>,
+#                             status:<code>, cache:<name>:hit, cache:<name>:miss
+#   yt_usage_callers:<day>    set of callers seen that day
+#
+# Per-caller LLM token accounting, same days and retention:
+#   llm_usage:<day>:<caller>  calls, errors, latency_ms, prompt_tokens, cached_tokens,
+#                             completion_tokens, calls:<model>
+#   llm_usage_callers:<day>   set of callers seen that day
+
+USAGE_RETENTION_SECONDS = 8 * 86400
+
+_caller = ContextVar("yt_caller", default=None)
+
+def current_caller():
+    """
+    Name to bill API calls to: the innermost tracked job, else the Flask endpoint.
+    """
+    name = _caller.get()
+    if name:
+        return name
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return "unknown"
+
+@contextmanager
+def caller(name):
+    token = _caller.set(name)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+def tracked(name):
+    """
+    Decorator billing every API call made inside the function to `name`.
+    Needed for scheduled jobs and executor tasks, which run outside a request.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with caller(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _usage_key(day, name, prefix="yt"):
+    return f"{prefix}_usage:{day}:{name}"
+
+def _callers_key(day, prefix="yt"):
+    return f"{prefix}_usage_callers:{day}"
+
+def _pipeline(redis, name, prefix="yt"):
+    day = quota_day()
+    key = _usage_key(day, name, prefix)
+    pipe = redis.pipeline()
+    pipe.sadd(_callers_key(day, prefix), name)
+    pipe.expire(_callers_key(day, prefix), USAGE_RETENTION_SECONDS)
+    return pipe, key
+
+def record_calls(redis, name, calls):
+    """
+    Record finished API calls for `name`. `calls` is a list of
+    (method_id, units, latency_ms, status) tuples.
+    """
+    if not calls:
+        return
+    pipe, key = _pipeline(redis, name)
+    for method_id, units, latency_ms, status in calls:
+        pipe.hincrby(key, "calls", 1)
+        pipe.hincrby(key, "units", units)
+        pipe.hincrby(key, "latency_ms", int(latency_ms))
+        pipe.hincrby(key, f"calls:{method_id}", 1)
+        pipe.hincrby(key, f"units:{method_id}", units)
+        pipe.hincrby(key, f"status:{status}", 1)
+    pipe.expire(key, USAGE_RETENTION_SECONDS)
+    pipe.execute()
+
+def record_cache(redis, name, cache, hits, misses):
+    if not hits and not misses:
+        return
+    pipe, key = _pipeline(redis, name)
+    pipe.hincrby(key, f"cache:{cache}:hit", hits)
+    pipe.hincrby(key, f"cache:{cache}:miss", misses)
+    pipe.expire(key, USAGE_RETENTION_SECONDS)
+    pipe.execute()
+
+def _summarize(raw):
+    calls = int(raw.get("calls", 0))
+    summary = {
+        "calls": calls,
+        "units": int(raw.get("units", 0)),
+        "avgLatencyMs": round(int(raw.get("latency_ms", 0)) / calls, 1) if calls else 0,
+        "methods": {},
+        "statuses": {},
+        "cache": {},
+    }
+    for field, value in raw.items():
+        kind, _, rest = field.partition(":")
+        if kind in ("calls", "units") and rest:
+            summary["methods"].setdefault(rest, {"calls": 0, "units": 0})[kind] = int(value)
+        elif kind == "status":
+            summary["statuses"][rest] = int(value)
+        elif kind == "cache":
+            cache, _, outcome = rest.rpartition(":")
+            summary["cache"].setdefault(cache, {"hit": 0, "miss": 0})[outcome] = int(value)
+    return summary
+
+def get_usage(redis, day=None):
+    """
+    Return {caller: summary} for a quota day, most expensive callers first.
+    """
+    day = day or quota_day()
+    callers = sorted(redis.smembers(_callers_key(day)))
+    if not callers:
+        return {}
+
+    pipe = redis.pipeline()
+    for name in callers:
+        pipe.hgetall(_usage_key(day, name))
+    usage = {name: _summarize(raw) for name, raw in zip(callers, pipe.execute())}
+    return dict(sorted(usage.items(), key=lambda item: item[1]["units"], reverse=True))
+
+def record_llm_call(redis, name, model, latency_ms, usage=None):
+    """
+    Record one finished chat completion for `name`. `usage` is the response's
+    usage block, or None if the call failed.
+    """
+    pipe, key = _pipeline(redis, name, "llm")
+    pipe.hincrby(key, "calls", 1)
+    pipe.hincrby(key, f"calls:{model}", 1)
+    pipe.hincrby(key, "latency_ms", int(latency_ms))
+    if usage is None:
+        pipe.hincrby(key, "errors", 1)
+    else:
+        details = getattr(usage, "prompt_tokens_details", None)
+        pipe.hincrby(key, "prompt_tokens", usage.prompt_tokens or 0)
+        pipe.hincrby(key, "cached_tokens", getattr(details, "cached_tokens", None) or 0)
+        pipe.hincrby(key, "completion_tokens", usage.completion_tokens or 0)
+    pipe.expire(key, USAGE_RETENTION_SECONDS)
+    pipe.execute()
+
+def _summarize_llm(raw):
+    calls = int(raw.get("calls", 0))
+    prompt_tokens = int(raw.get("prompt_tokens", 0))
+    cached_tokens = int(raw.get("cached_tokens", 0))
+    return {
+        "calls": calls,
+        "errors": int(raw.get("errors", 0)),
+        "avgLatencyMs": round(int(raw.get("latency_ms", 0)) / calls, 1) if calls else 0,
+        "promptTokens": prompt_tokens,
+        "cachedTokens": cached_tokens,
+        "completionTokens": int(raw.get("completion_tokens", 0)),
+        "cacheHitRate": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0,
+        "models": {
+            field.partition(":")[2]: int(value)
+            for field, value in raw.items() if field.startswith("calls:")
+        },
+    }
+
+def get_llm_usage(redis, day=None):
+    """
+    Return {caller: summary} of LLM token usage for a quota day, most prompt tokens first.
+    """
+    day = day or quota_day()
+    callers = sorted(redis.smembers(_callers_key(day, "llm")))
+    if not callers:
+        return {}
+
+    pipe = redis.pipeline()
+    for name in callers:
+        pipe.hgetall(_usage_key(day, name, "llm"))
+    usage = {name: _summarize_llm(raw) for name, raw in zip(callers, pipe.execute())}
+    return dict(sorted(usage.items(), key=lambda item: item[1]["promptTokens"], reverse=True))
@@ -0,0 +1,48 @@
+import numpy as np
+import struct
+
+# Compact, self-describing vector encodings for Redis and Mongo.
+# The first byte names the codec:
+#   float32  4 bytes per dimension
+#   float16  2 bytes per dimension (max error ~1e-3 on unit vectors)
+#   int8     1 byte per dimension plus a float32 scale, values = codes * scale
+
+CODECS = {"float32": 1, "float16": 2, "int8": 3}
+_CODEC_NAMES = {tag: name for name, tag in CODECS.items()}
+
+def quantize_int8(matrix):
+    """
+    Per-row symmetric int8 quantization: returns (codes, scales) with rows ≈ codes * scales.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=-1, keepdims=True) / 127
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+    return codes, scales.squeeze(-1).astype(np.float32)
+
+def encode(vector, codec="float16"):
+    vector = np.asarray(vector, dtype=np.float32)
+    if codec == "float32":
+        payload = vector.tobytes()
+    elif codec == "float16":
+        payload = vector.astype(np.float16).tobytes()
+    elif codec == "int8":
+        codes, scale = quantize_int8(vector)
+        payload = struct.pack("<f", float(scale)) + codes.tobytes()
+    else:
+        raise ValueError(f"Unknown vector codec: {codec}")
+    return bytes([CODECS[codec]]) + payload
+
+def decode(raw):
+    """
+    float32 vector from bytes written by encode().
+    """
+    codec, payload = _CODEC_NAMES.get(raw[0]), memoryview(raw)[1:]
+    if codec == "float32":
+        return np.frombuffer(payload, dtype=np.float32)
+    if codec == "float16":
+        return np.frombuffer(payload, dtype=np.float16).astype(np.float32)
+    if codec == "int8":
+        (scale,) = struct.unpack_from("<f", payload)
+        return np.frombuffer(payload[4:], dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"Unknown vector codec tag: {raw[0]}")
@@ -0,0 +1,222 @@
+from flask import current_app
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+import humanize
+import json
+import re
+from utils.parser import chunkify
+from utils.youtube_api import track_cache
+
+# Snippet fields (title, duration, publishedAt, ...) barely change; view counts do
+SNIPPET_TTL_SECONDS = 3 * 86400
+STATS_TTL_SECONDS = 10 * 60
+
+# Partial-response masks: only the fields Video.from_item and _view_count read
+VIDEO_FIELDS = (
+    "items(id,snippet(title,description,thumbnails/high/url,publishedAt,channelId,channelTitle),"
+    "contentDetails/duration,statistics/viewCount)"
+)
+VIDEO_STATS_FIELDS = "items(id,statistics/viewCount)"
+
+# ISO 8601 durations as videos.list returns them (PT1H2M3S, P1DT2H, P0D for live streams)
+_DURATION_RE = re.compile(
+    r"P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$"
+)
+# RFC 3339 timestamps (2024-05-01T12:00:00Z, optional fraction and offset)
+_TIMESTAMP_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.\d+)?(?:(Z|z)|([+-])(\d{2}):?(\d{2}))?$"
+)
+
+def parse_duration_seconds(value):
+    """
+    Whole seconds in an ISO 8601 duration, 0 if it can't be parsed.
+    """
+    m = _DURATION_RE.match(value or "")
+    if not m:
+        return 0
+    weeks, days, hours, minutes, seconds = m.groups()
+    return (
+        int(weeks or 0) * 604800 + int(days or 0) * 86400 + int(hours or 0) * 3600
+        + int(minutes or 0) * 60 + int(float(seconds or 0))
+    )
+
+def parse_timestamp(value):
+    """
+    Aware UTC datetime for an RFC 3339 timestamp, None if it can't be parsed.
+    """
+    m = _TIMESTAMP_RE.match(value or "")
+    if not m:
+        return None
+    year, month, day, hour, minute, second, _, sign, off_h, off_m = m.groups()
+    dt = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), tzinfo=timezone.utc)
+    if sign:
+        offset = timedelta(hours=int(off_h), minutes=int(off_m))
+        dt = dt - offset if sign == "+" else dt + offset
+    return dt
+
+def time_ago(published_at, now=None):
+    published = parse_timestamp(published_at)
+    if not published:
+        return ""
+    return humanize.naturaltime((now or datetime.now(timezone.utc)) - published)
+
+def with_time_ago(videos, now=None):
+    """
+    Add the presentation-only `timeAgo` field to serialized videos at response time.
+    """
+    now = now or datetime.now(timezone.utc)
+    return [{**v, "timeAgo": time_ago(v.get("publishedAt"), now)} for v in videos]
+
+def _snippet_key(video_id):
+    # v2: Video.to_row() lists; the dicts under the old `video:<id>` keys just expire
+    return f"video:v2:{video_id}"
+
+def _stats_key(video_id):
+    return f"video_stats:{video_id}"
+
+@dataclass(slots=True)
+class Video:
+    """
+    Compact video record. Cached in Redis as a JSON row, turned into the API dict
+    shape only when a response is built.
+    """
+    video_id: str
+    title: str
+    description: str
+    thumbnail: str
+    published_at: str
+    total_seconds: int
+    channel_title: str
+    channel_id: str
+    view_count: int = 0
+
+    @classmethod
+    def from_item(cls, item):
+        """
+        Build a record from a raw videos.list item.
+        """
+        snippet = item["snippet"]
+        return cls(
+            item["id"],
+            snippet["title"],
+            snippet.get("description", ""),
+            snippet.get("thumbnails", {}).get("high", {}).get("url", ""),
+            snippet["publishedAt"],
+            parse_duration_seconds(item.get("contentDetails", {}).get("duration")),
+            snippet.get("channelTitle", ""),
+            snippet.get("channelId", ""),
+            _view_count(item),
+        )
+
+    @classmethod
+    def from_row(cls, row, view_count=0):
+        return cls(*row, view_count)
+
+    def to_row(self):
+        # Everything but the view count, which is cached separately with a short TTL
+        return [
+            self.video_id, self.title, self.description, self.thumbnail,
+            self.published_at, self.total_seconds, self.channel_title, self.channel_id,
+        ]
+
+    @property
+    def published(self):
+        return parse_timestamp(self.published_at)
+
+    @property
+    def is_short(self):
+        return self.total_seconds <= 180
+
+    @property
+    def length(self):
+        mins, secs = divmod(self.total_seconds, 60)
+        hrs, mins = divmod(mins, 60)
+        return f"{hrs}:{mins:02}:{secs:02}" if hrs > 0 else f"{mins}:{secs:02}"
+
+    def to_dict(self):
+        return {
+            "videoId": self.video_id,
+            "title": self.title,
+            "description": self.description,
+            "thumbnail": self.thumbnail,
+            "publishedAt": self.published_at,
+            "length": self.length,
+            "totalSeconds": self.total_seconds,
+            "channelTitle": self.channel_title,
+            "channelId": self.channel_id,
+            "isShort": self.is_short,
+            "viewCount": self.view_count,
+        }
+
+def _view_count(item):
+    stats = item.get("statistics", {})
+    return int(stats.get("viewCount", 0)) if stats.get("viewCount") else 0
+
+def _fetch(yt, video_ids, part, fields):
+    items = []
+    for chunk in chunkify(video_ids, 50):
+        try:
+            resp = yt.videos().list(part=part, id=",".join(chunk), fields=fields).execute()
+            items.extend(resp.get("items", []))
+        except Exception as e:
+            current_app.logger.warning(f"Failed to fetch chunk details: {e}")
+    return items
+
+def get_videos(yt, video_ids):
+    """
+    Return {videoId: Video} for the given IDs, served from the shared Redis video cache.
+    Only IDs with a missing snippet or stale statistics are fetched, in 50-ID batches.
+    Videos the API no longer returns (private, deleted) are left out.
+    """
+    video_ids = list(dict.fromkeys(vid for vid in video_ids if vid))
+    if not video_ids:
+        return {}
+
+    redis = current_app.extensions["redis"]
+    rows, views = {}, {}
+
+    try:
+        pipe = redis.pipeline()
+        pipe.mget([_snippet_key(vid) for vid in video_ids])
+        pipe.mget([_stats_key(vid) for vid in video_ids])
+        cached_rows, cached_views = pipe.execute()
+        for vid, raw_row, raw_views in zip(video_ids, cached_rows, cached_views):
+            if raw_row:
+                rows[vid] = json.loads(raw_row)
+            if raw_views is not None:
+                views[vid] = int(raw_views)
+    except Exception as e:
+        current_app.logger.warning(f"Video cache read failed: {e}")
+
+    missing = [vid for vid in video_ids if vid not in rows]
+    stale = [vid for vid in video_ids if vid in rows and vid not in views]
+    track_cache("video", len(video_ids) - len(missing) - len(stale), len(missing) + len(stale))
+
+    videos = {}
+    fresh_views = {}
+    for item in _fetch(yt, missing, "snippet,contentDetails,statistics", VIDEO_FIELDS):
+        try:
+            videos[item["id"]] = Video.from_item(item)
+        except Exception as e:
+            current_app.logger.warning(f"Failed to process video item: {e}")
+    for item in _fetch(yt, stale, "statistics", VIDEO_STATS_FIELDS):
+        fresh_views[item["id"]] = _view_count(item)
+
+    if videos or fresh_views:
+        try:
+            pipe = redis.pipeline()
+            for vid, video in videos.items():
+                pipe.setex(_snippet_key(vid), timedelta(seconds=SNIPPET_TTL_SECONDS), json.dumps(video.to_row()))
+                pipe.setex(_stats_key(vid), timedelta(seconds=STATS_TTL_SECONDS), video.view_count)
+            for vid, view_count in fresh_views.items():
+                pipe.setex(_stats_key(vid), timedelta(seconds=STATS_TTL_SECONDS), view_count)
+            pipe.execute()
+        except Exception as e:
+            current_app.logger.warning(f"Video cache write failed: {e}")
+
+    views.update(fresh_views)
+    for vid, row in rows.items():
+        if vid in views:
+            videos[vid] = Video.from_row(row, views[vid])
+
+    return {vid: videos[vid] for vid in video_ids if vid in videos}
@@ -1,107 +1,562 @@
 from flask import current_app
-from dateutil import parser as date_parser
-from datetime import datetime, timezone
-import humanize
-import isodate
-from googleapiclient.discovery import build
-from utils.parser import chunkify
+from datetime import timedelta
+import httplib2
+import threading
+import time
+import json
 import random
+import re
+import hashlib
+from functools import partial
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, BatchHttpRequest
+from urllib.parse import urljoin
+from utils.parser import chunkify, parse_channel_metadata
+from utils.db import get_redis_cache, set_redis_cache
+from pymongo import UpdateOne
+from extensions import mongo
+from utils.quota import (
+    QuotaExhaustedError,
+    QUOTA_ERROR_REASONS,
+    DEFAULT_DAILY_QUOTA,
+    quota_cost,
+    charge_key,
+    mark_exhausted,
+    pick_key,
+)
+from utils.usage import current_caller, record_calls, record_cache
 import logging
 
+HTTP_TIMEOUT_SECONDS = 30
+
+# Per-thread httplib2 transports. httplib2.Http is not thread-safe, so request
+# threads, executor threads and APScheduler threads each get their own.
+_thread_local = threading.local()
+
+def _thread_http(api_key):
+    transports = getattr(_thread_local, "transports", None)
+    if transports is None:
+        transports = _thread_local.transports = {}
+    if api_key not in transports:
+        transports[api_key] = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+    return transports[api_key]
+
+def error_reason(e):
+    """
+    Return the first `reason` from a YouTube API error body, e.g. "quotaExceeded".
+    """
+    try:
+        errors = json.loads(e.content).get("error", {}).get("errors", [])
+        return errors[0].get("reason") if errors else None
+    except Exception:
+        return None
+
+def is_quota_error(e):
+    return isinstance(e, HttpError) and e.resp.status == 403 and error_reason(e) in QUOTA_ERROR_REASONS
+
+def _daily_quota():
+    return current_app.config.get("YT_DAILY_QUOTA", DEFAULT_DAILY_QUOTA)
+
+def charge_call(api_key, method_id):
+    """
+    Charge one API call against the key's shared quota ledger.
+    """
+    try:
+        charge_key(current_app.extensions["redis"], api_key, quota_cost(method_id))
+    except Exception as e:
+        current_app.logger.warning(f"Failed to record YouTube quota usage: {e}")
+
+def track_calls(calls):
+    """
+    Record finished (method_id, units, latency_ms, status) calls against the current caller.
+    """
+    try:
+        record_calls(current_app.extensions["redis"], current_caller(), calls)
+    except Exception as e:
+        current_app.logger.warning(f"Failed to record YouTube call metrics: {e}")
+
+def track_cache(cache, hits, misses):
+    try:
+        record_cache(current_app.extensions["redis"], current_caller(), cache, hits, misses)
+    except Exception as e:
+        current_app.logger.warning(f"Failed to record {cache} cache metrics: {e}")
+
+def retire_key(api_key):
+    try:
+        mark_exhausted(current_app.extensions["redis"], api_key)
+    except Exception as e:
+        current_app.logger.warning(f"Failed to mark YouTube key exhausted: {e}")
+    current_app.logger.warning("YouTube API key exhausted, skipping it until the Pacific-midnight reset")
+
+def select_api_key(exclude=()):
+    keys = current_app.config["YT_API_KEYS"]
+    try:
+        key = pick_key(current_app.extensions["redis"], keys, _daily_quota(), exclude=exclude)
+    except Exception as e:
+        current_app.logger.warning(f"Quota ledger unavailable, picking a random key: {e}")
+        remaining = [k for k in keys if k not in exclude]
+        return random.choice(remaining) if remaining else None
+    return key
+
+class MeteredRequest(HttpRequest):
+    """
+    HttpRequest that charges the quota ledger, records per-caller metrics and
+    moves to the next-best key when the current one reports quotaExceeded.
+    """
+
+    def __init__(self, api_key, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_key = api_key
+
+    def execute(self, http=None, num_retries=0):
+        tried = set()
+        while True:
+            started = time.perf_counter()
+            try:
+                resp = super().execute(http=http, num_retries=num_retries)
+            except HttpError as e:
+                self._track(started, e.resp.status)
+                if not is_quota_error(e):
+                    charge_call(self.api_key, self.methodId)
+                    raise
+                # Calls rejected for quota don't cost anything
+                retire_key(self.api_key)
+                tried.add(self.api_key)
+                if not self.fail_over(tried):
+                    raise
+            except Exception:
+                self._track(started, "error")
+                raise
+            else:
+                charge_call(self.api_key, self.methodId)
+                self._track(started, 200)
+                return resp
+
+    def fail_over(self, retired):
+        """
+        Move the request to the best key not in `retired`. False if none is left.
+        """
+        next_key = select_api_key(exclude=retired)
+        if not next_key:
+            return False
+        self._switch_key(next_key)
+        return True
+
+    def _track(self, started, status):
+        latency_ms = (time.perf_counter() - started) * 1000
+        track_calls([(self.methodId, quota_cost(self.methodId), latency_ms, status)])
+
+    def _switch_key(self, api_key):
+        self.uri = self.uri.replace(f"key={self.api_key}", f"key={api_key}")
+        self.http = _thread_http(api_key)
+        self.api_key = api_key
+
+def _build_request(api_key, http, *args, **kwargs):
+    return MeteredRequest(api_key, _thread_http(api_key), *args, **kwargs)
+
+def _build_client(api_key, endpoint=None):
+    # GOOGLE_YT_API_ENDPOINT points the client at a local stand-in (see bench/)
+    return build(
+        "youtube", "v3",
+        developerKey=api_key,
+        static_discovery=True,
+        cache_discovery=False,
+        requestBuilder=partial(_build_request, api_key),
+        client_options={"api_endpoint": endpoint} if endpoint else None,
+    )
+
+def _new_batch(yt, callback):
+    # The discovery document's batch URI ignores api_endpoint overrides
+    endpoint = current_app.config.get("YT_API_ENDPOINT")
+    if endpoint:
+        return BatchHttpRequest(callback=callback, batch_uri=urljoin(endpoint, "batch"))
+    return yt.new_batch_http_request(callback=callback)
+
+def init_youtube_clients(app):
+    """
+    Pre-build one YouTube service per API key and store the pool on the app.
+    """
+    pool = {}
+    for key in app.config["YT_API_KEYS"]:
+        try:
+            pool[key] = _build_client(key, app.config.get("YT_API_ENDPOINT"))
+        except Exception as e:
+            app.logger.error(f"Failed to build YouTube client: {e}")
+    app.extensions["youtube_clients"] = pool
+    return pool
+
 def get_youtube_client():
     try:
-        key = random.choice(current_app.config["YT_API_KEYS"])
-        return build("youtube", "v3", developerKey=key)
+        pool = current_app.extensions.get("youtube_clients")
+        if pool is None:
+            pool = init_youtube_clients(current_app)
+        key = select_api_key()
+        if not key:
+            raise QuotaExhaustedError("All YouTube API keys are out of quota until the Pacific-midnight reset")
+        if key not in pool:
+            pool[key] = _build_client(key, current_app.config.get("YT_API_ENDPOINT"))
+        return pool[key]
     except Exception as e:
         current_app.logger.error(f"Failed to initialize YouTube client: {e}")
         raise
 
-def fetch_channel_videos(yt_client, uploads_id, max_videos=50, page_token=None):
-    all_videos = []
-    seen_video_ids = set()
+BATCH_SIZE = 50
+
+# Partial-response masks for the helpers below
+UPLOADS_ID_FIELDS = "items(id,contentDetails/relatedPlaylists/uploads)"
+PLAYLIST_ITEM_FIELDS = "etag,items/contentDetails/videoId"
+CHANNEL_METADATA_FIELDS = (
+    "etag,items(id,snippet(title,description,thumbnails/default/url),"
+    "statistics(subscriberCount,viewCount,videoCount),contentDetails/relatedPlaylists/uploads)"
+)
+ETAG_TTL_SECONDS = 2 * 86400
+
+def _etag_key(req):
+    """
+    Cache key for a request's last response, independent of the API key used.
+    """
+    uri = re.sub(r"([?&])key=[^&]*&?", r"\1", req.uri).rstrip("?&")
+    return f"etag:{hashlib.sha1(f'{req.method} {uri}'.encode()).hexdigest()}"
+
+def _load_etag_entries(reqs):
+    redis = current_app.extensions["redis"]
+    try:
+        raw = redis.mget([_etag_key(req) for req in reqs])
+        return [json.loads(val) if val else None for val in raw]
+    except Exception as e:
+        current_app.logger.warning(f"ETag cache read failed: {e}")
+        return [None] * len(reqs)
+
+def _store_etag_entry(req, resp):
+    if not resp.get("etag"):
+        return
+    try:
+        set_redis_cache(
+            current_app.extensions["redis"], _etag_key(req),
+            {"etag": resp["etag"], "body": resp}, ttl_seconds=ETAG_TTL_SECONDS
+        )
+    except Exception as e:
+        current_app.logger.warning(f"ETag cache write failed: {e}")
+
+def _not_modified(req, exception, cached):
+    """
+    Treat a 304 answer as a cache hit: return the stored body and extend its TTL.
+    """
+    if not cached or not isinstance(exception, HttpError) or exception.resp.status != 304:
+        return None
+    try:
+        current_app.extensions["redis"].expire(_etag_key(req), ETAG_TTL_SECONDS)
+    except Exception:
+        pass
+    return cached["body"]
 
+def execute_conditional(req):
+    """
+    Execute a request with If-None-Match set from the last stored response.
+    Unchanged resources come back as 304 and are served from the stored body.
+    """
+    cached = _load_etag_entries([req])[0]
+    if cached:
+        req.headers["If-None-Match"] = cached["etag"]
     try:
-        while len(all_videos) < max_videos:
-            resp = yt_client.playlistItems().list(
+        resp = req.execute()
+    except HttpError as e:
+        body = _not_modified(req, e, cached)
+        if body is None:
+            raise
+        track_cache("etag", 1, 0)
+        return body
+    if cached:
+        track_cache("etag", 0, 1)
+    _store_etag_entry(req, resp)
+    return resp
+
+def batch_execute(yt, requests, conditional=False):
+    """
+    Send independent API requests through BatchHttpRequest, up to 50 per HTTP call.
+    `requests` maps a caller-chosen ID to an unexecuted request; returns
+    {request_id: response} for every request that succeeded. With `conditional`,
+    each request carries its stored ETag and 304 answers are served from cache.
+    """
+    results = {}
+    quota_failed = []
+    cached = {}
+    statuses = {}
+
+    if conditional and requests:
+        entries = _load_etag_entries(list(requests.values()))
+        for (request_id, req), entry in zip(requests.items(), entries):
+            if entry:
+                cached[request_id] = entry
+                req.headers["If-None-Match"] = entry["etag"]
+
+    def callback(request_id, response, exception):
+        req = requests[request_id]
+        statuses[request_id] = exception.resp.status if isinstance(exception, HttpError) else (
+            "error" if exception is not None else 200
+        )
+        if is_quota_error(exception):
+            quota_failed.append(request_id)
+            return
+        if exception is None or isinstance(exception, HttpError):
+            charge_call(req.api_key, req.methodId)
+        if exception is not None:
+            body = _not_modified(req, exception, cached.get(request_id))
+            if body is not None:
+                results[request_id] = body
+            else:
+                current_app.logger.warning(f"Batched YouTube request {request_id} failed: {exception}")
+            return
+        if conditional:
+            _store_etag_entry(req, response)
+        results[request_id] = response
+
+    # Requests rejected for quota go back to the front of the queue on another key
+    pending = list(requests.items())
+    retired = set()
+    while pending:
+        chunk, pending = pending[:BATCH_SIZE], pending[BATCH_SIZE:]
+        if retired:
+            moved = [(request_id, req) for request_id, req in chunk
+                     if req.api_key not in retired or req.fail_over(retired)]
+            if len(moved) < len(chunk):
+                current_app.logger.warning(
+                    f"{len(chunk) - len(moved)} batched YouTube requests dropped: no API key with quota left"
+                )
+            chunk = moved
+            if not chunk:
+                continue
+
+        batch = _new_batch(yt, callback)
+        for request_id, req in chunk:
+            batch.add(req, request_id=request_id)
+        quota_failed.clear()
+        started = time.perf_counter()
+        try:
+            batch.execute()
+        except Exception as e:
+            current_app.logger.warning(f"Batched YouTube request failed: {e}")
+
+        # One HTTP round trip serves the whole chunk, so its latency is split evenly
+        latency_ms = (time.perf_counter() - started) * 1000 / len(chunk)
+        track_calls([
+            (req.methodId, quota_cost(req.methodId), latency_ms, statuses.get(request_id, "error"))
+            for request_id, req in chunk
+        ])
+
+        if quota_failed:
+            for api_key in {requests[request_id].api_key for request_id in quota_failed}:
+                retire_key(api_key)
+                retired.add(api_key)
+            pending = [(request_id, requests[request_id]) for request_id in quota_failed] + pending
+
+    if cached:
+        hits = sum(1 for request_id in cached if statuses.get(request_id) == 304)
+        track_cache("etag", hits, len(cached) - hits)
+
+    return results
+
+def fetch_uploads_ids(yt, channel_ids):
+    """
+    Map channel IDs to their uploads playlist IDs, 50 channels per channels.list call.
+    """
+    uploads = {}
+    for chunk in chunkify(list(dict.fromkeys(channel_ids)), BATCH_SIZE):
+        try:
+            resp = yt.channels().list(
                 part="contentDetails",
-                playlistId=uploads_id,
-                maxResults=min(50, max_videos - len(all_videos)),
-                pageToken=page_token
+                id=",".join(chunk),
+                maxResults=BATCH_SIZE,
+                fields=UPLOADS_ID_FIELDS
             ).execute()
+        except Exception as e:
+            current_app.logger.warning(f"Failed to fetch uploads playlists: {e}")
+            continue
+
+        for item in resp.get("items", []):
+            uploads_id = item.get("contentDetails", {}).get("relatedPlaylists", {}).get("uploads")
+            if uploads_id:
+                uploads[item["id"]] = uploads_id
+    return uploads
+
+UPLOADS_ID_TTL_SECONDS = 30 * 86400
+CHANNEL_ID_RE = re.compile(r"^UC[\w-]{22}$")
+
+def derive_uploads_id(channel_id):
+    """
+    A channel's uploads playlist is its ID with the "UC" prefix swapped for "UU".
+    """
+    if channel_id and CHANNEL_ID_RE.match(channel_id):
+        return "UU" + channel_id[2:]
+    return None
 
-            items = resp.get("items", [])
-            video_ids = [
-                item["contentDetails"].get("videoId")
-                for item in items
-                if item.get("contentDetails", {}).get("videoId")
-            ]
-
-            # De-duplication
-            video_ids = [vid for vid in video_ids if vid not in seen_video_ids]
-            seen_video_ids.update(video_ids)
-
-            # Fetch details in chunks
-            details = []
-            for chunk in chunkify(video_ids, 50):
-                try:
-                    details_resp = yt_client.videos().list(
-                        part="snippet,contentDetails,statistics",
-                        id=",".join(chunk)
-                    ).execute()
-                    details.extend(details_resp.get("items", []))
-                except Exception as e:
-                    current_app.logger.warning(f"Failed to fetch chunk details: {e}")
-
-            for item in details:
-                try:
-                    snippet = item["snippet"]
-                    stats = item.get("statistics", {})
-                    content = item.get("contentDetails", {})
-
-                    iso_duration = content.get("duration", "PT0S")
-                    duration = isodate.parse_duration(iso_duration)
-                    total_seconds = int(duration.total_seconds())
-
-                    mins, secs = divmod(total_seconds, 60)
-                    hrs, mins = divmod(mins, 60)
-                    length = f"{hrs}:{mins:02}:{secs:02}" if hrs > 0 else f"{mins}:{secs:02}"
-
-                    published = date_parser.parse(snippet["publishedAt"])
-                    time_ago = humanize.naturaltime(datetime.now(timezone.utc) - published)
-
-                    is_short = total_seconds <= 180
-                    thumbnail = snippet.get("thumbnails", {}).get("high", {})
-
-                    all_videos.append({
-                        "videoId": item["id"],
-                        "title": snippet["title"],
-                        "description": snippet.get("description", ""),
-                        "thumbnail": thumbnail.get("url", ""),
-                        "publishedAt": snippet["publishedAt"],
-                        "timeAgo": time_ago,
-                        "length": length,
-                        "totalSeconds": total_seconds,
-                        "viewCount": int(stats.get("viewCount", 0)),
-                        "channelTitle": snippet.get("channelTitle", ""),
-                        "channelId": snippet.get("channelId", ""),
-                        "isShort": is_short
-                    })
-                except Exception as e:
-                    current_app.logger.warning(f"Failed to process video item: {e}")
-
-            page_token = resp.get("nextPageToken")
-            if not page_token:
-                break
+def _load_uploads_mappings(channel_ids, include_mongo):
+    redis = current_app.extensions["redis"]
+    found = {}
+    try:
+        cached = redis.mget([f"uploads_id:{ch}" for ch in channel_ids])
+        found.update({ch: val for ch, val in zip(channel_ids, cached) if val})
+    except Exception as e:
+        current_app.logger.warning(f"Uploads mapping cache read failed: {e}")
+
+    misses = [ch for ch in channel_ids if ch not in found]
+    if include_mongo and misses:
+        for doc in mongo.db.uploads_playlists.find({"_id": {"$in": misses}}):
+            found[doc["_id"]] = doc["uploadsId"]
+    return found
 
+def _store_uploads_mappings(mapping):
+    if not mapping:
+        return
+    redis = current_app.extensions["redis"]
+    try:
+        pipe = redis.pipeline()
+        for ch, uploads_id in mapping.items():
+            pipe.setex(f"uploads_id:{ch}", timedelta(seconds=UPLOADS_ID_TTL_SECONDS), uploads_id)
+        pipe.execute()
     except Exception as e:
-        current_app.logger.error(f"Failed to fetch channel videos for {uploads_id}: {e}")
-        return {
-            "videos": [],
-            "nextPageToken": None,
-            "error": str(e)
-        }
+        current_app.logger.warning(f"Uploads mapping cache write failed: {e}")
+
+    mongo.db.uploads_playlists.bulk_write([
+        UpdateOne({"_id": ch}, {"$set": {"uploadsId": uploads_id}}, upsert=True)
+        for ch, uploads_id in mapping.items()
+    ])
+
+def resolve_uploads_ids(yt, channel_ids, refresh=False):
+    """
+    Map channel IDs to uploads playlist IDs without a channels.list call where possible.
+    Order: stored mapping, then the UC -> UU derivation, then the API. `refresh=True`
+    skips straight to the API, for when a playlist fetch with the known ID failed.
+    """
+    channel_ids = list(dict.fromkeys(ch for ch in channel_ids if ch))
+    resolved = {}
+
+    if not refresh:
+        # Mongo is only consulted for IDs that can't be derived
+        resolved.update(_load_uploads_mappings(channel_ids, include_mongo=False))
+        for ch in channel_ids:
+            if ch not in resolved and derive_uploads_id(ch):
+                resolved[ch] = derive_uploads_id(ch)
+        misses = [ch for ch in channel_ids if ch not in resolved]
+        if misses:
+            resolved.update(_load_uploads_mappings(misses, include_mongo=True))
+
+    missing = [ch for ch in channel_ids if ch not in resolved]
+    if missing:
+        fetched = fetch_uploads_ids(yt, missing)
+        try:
+            _store_uploads_mappings(fetched)
+        except Exception as e:
+            current_app.logger.warning(f"Failed to store uploads mappings: {e}")
+        resolved.update(fetched)
+
+    return resolved
+
+def resolve_uploads_id(yt, channel_id, refresh=False):
+    return resolve_uploads_ids(yt, [channel_id], refresh=refresh).get(channel_id)
+
+def batch_playlist_items(yt, playlist_ids, max_results=15, part="contentDetails", fields=PLAYLIST_ITEM_FIELDS):
+    """
+    Fetch the first page of several playlists in batched HTTP calls.
+    Returns {playlist_id: items}; failed playlists are left out.
+    """
+    requests = {
+        playlist_id: yt.playlistItems().list(
+            part=part,
+            playlistId=playlist_id,
+            maxResults=max_results,
+            fields=fields
+        )
+        for playlist_id in dict.fromkeys(playlist_ids)
+    }
+    responses = batch_execute(yt, requests, conditional=True)
+    return {playlist_id: resp.get("items", []) for playlist_id, resp in responses.items()}
+
+CHANNEL_METADATA_TTL_SECONDS = 86400
+
+def fetch_channel_metadata(yt, channel_id):
+    """
+    Parsed channel metadata, served from the shared `channel_metadata:<id>` cache.
+    Returns None if the channel doesn't exist.
+    """
+    redis = current_app.extensions["redis"]
+    redis_key = f"channel_metadata:{channel_id}"
+
+    cached = get_redis_cache(redis, redis_key)
+    if cached and cached.get("uploadsId"):
+        return cached
+
+    chan_info = execute_conditional(yt.channels().list(
+        part="snippet,statistics,contentDetails",
+        id=channel_id,
+        fields=CHANNEL_METADATA_FIELDS
+    ))
+    if not chan_info.get("items"):
+        return None
+
+    meta = parse_channel_metadata(chan_info)
+    set_redis_cache(redis, redis_key, meta, ttl_seconds=CHANNEL_METADATA_TTL_SECONDS)
+    return meta
+
+def fetch_channels_metadata(yt, channel_ids):
+    """
+    Batch fetch_channel_metadata(): {channel_id: metadata} for the channels that exist.
+    Cache misses are fetched 50 channels per channels.list call.
+    """
+    channel_ids = list(dict.fromkeys(ch for ch in channel_ids if ch))
+    if not channel_ids:
+        return {}
+
+    redis = current_app.extensions["redis"]
+    found = {}
+    try:
+        for channel_id, raw in zip(channel_ids, redis.mget([f"channel_metadata:{ch}" for ch in channel_ids])):
+            meta = json.loads(raw) if raw else None
+            if meta and meta.get("uploadsId"):
+                found[channel_id] = meta
+    except Exception as e:
+        current_app.logger.warning(f"Channel metadata cache read failed: {e}")
+
+    missing = [ch for ch in channel_ids if ch not in found]
+    for chunk in chunkify(missing, BATCH_SIZE):
+        try:
+            resp = yt.channels().list(
+                part="snippet,statistics,contentDetails",
+                id=",".join(chunk),
+                maxResults=BATCH_SIZE,
+                fields=CHANNEL_METADATA_FIELDS
+            ).execute()
+        except Exception as e:
+            current_app.logger.warning(f"Failed to fetch channel metadata: {e}")
+            continue
+
+        pipe = redis.pipeline()
+        for item in resp.get("items", []):
+            meta = parse_channel_metadata({"items": [item]})
+            set_redis_cache(pipe, f"channel_metadata:{meta['channelId']}", meta, ttl_seconds=CHANNEL_METADATA_TTL_SECONDS)
+            found[meta["channelId"]] = meta
+        pipe.execute()
+    return found
+
+def batch_channel_uploads(yt, channel_ids, max_results=15, part="contentDetails", fields=PLAYLIST_ITEM_FIELDS):
+    """
+    Fetch the first page of several channels' uploads playlists in batched calls.
+    Playlists that fail are re-resolved through the API once and retried.
+    Returns {channel_id: items}; channels that can't be resolved are left out.
+    """
+    uploads_ids = resolve_uploads_ids(yt, channel_ids)
+    playlists = batch_playlist_items(yt, uploads_ids.values(), max_results=max_results, part=part, fields=fields)
+
+    failed = [ch for ch, uploads_id in uploads_ids.items() if uploads_id not in playlists]
+    if failed:
+        refreshed = resolve_uploads_ids(yt, failed, refresh=True)
+        retry = {ch: pid for ch, pid in refreshed.items() if pid != uploads_ids[ch]}
+        playlists.update(batch_playlist_items(yt, retry.values(), max_results=max_results, part=part, fields=fields))
+        uploads_ids.update(refreshed)
 
     return {
-        "videos": all_videos[:max_videos],
-        "nextPageToken": page_token
-    }
\ No newline at end of file
+        ch: playlists[uploads_id]
+        for ch, uploads_id in uploads_ids.items()
+        if uploads_id in playlists
+    }
@@ -1,4 +1,4 @@
-import axios from "./axios"; // custom axios instance
+import axios, { getCsrfToken } from "./axios"; // custom axios instance
 
 // Auth
 export const signup = (data) => axios.post("/auth/signup", data);
@@ -76,8 +76,28 @@ export const fetchChannelMetadata = (channelId) =>
     .get(`/channel/${encodeURIComponent(channelId)}/metadata`)
     .then((res) => res.data);
 
-export const addChannel = (channelData) =>
-  axios.post("/channel/add", channelData);
+export const getAddChannelStatus = (jobId) =>
+  axios
+    .get(`/channel/add/${encodeURIComponent(jobId)}`)
+    .then((res) => res.data);
+
+// Adding a channel runs in the background on the server: queue it, then poll
+// until it's analysed and saved. Resolves with the saved channel.
+export async function addChannel(
+  channelData,
+  { intervalMs = 1000, timeoutMs = 120000 } = {},
+) {
+  const { data } = await axios.post("/channel/add", channelData);
+  const deadline = Date.now() + timeoutMs;
+
+  while (Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    const job = await getAddChannelStatus(data.jobId);
+    if (job.status === "done") return job.channel;
+    if (job.status === "failed") throw new Error(job.error);
+  }
+  throw new Error("Adding the channel is taking longer than expected.");
+}
 
 export const removeChannel = (channelId) =>
   axios.post("/channel/remove", { channelId });
@@ -184,3 +204,65 @@ export async function removeCompetitorFromList(
 // Generators
 export const generateTitle = (idea, channelId) =>
   axios.post("/generators/title", { idea, channelId }).then((res) => res.data);
+
+// Streams titles over Server-Sent Events, calling onTitle(title, index) as each
+// one is generated. Resolves with all titles. An expired session goes through
+// the regular endpoint instead, where the axios instance refreshes it.
+export async function streamTitles(idea, channelId, onTitle) {
+  const res = await fetch("/api/generators/title/stream", {
+    method: "POST",
+    credentials: "include",
+    headers: {
+      "Content-Type": "application/json",
+      "X-CSRF-Token": getCsrfToken() ?? "",
+    },
+    body: JSON.stringify({ idea, channelId }),
+  });
+
+  if (res.status === 401 || (res.ok && !res.body)) {
+    const data = await generateTitle(idea, channelId);
+    const titles = Array.isArray(data.titles) ? data.titles : [];
+    titles.forEach((title, index) => onTitle(title, index));
+    return titles;
+  }
+  if (!res.ok) {
+    const data = await res.json().catch(() => ({}));
+    throw new Error(data.error || `Title generation failed (${res.status})`);
+  }
+
+  const titles = [];
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of message.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === "title") {
+        titles.push(payload.title);
+        onTitle(payload.title, payload.index);
+      } else if (event === "error") {
+        throw new Error(payload.error);
+      } else if (event === "done") {
+        return titles;
+      }
+    }
+  }
+  if (!titles.length) throw new Error("Title stream ended early");
+  return titles;
+}
@@ -6,19 +6,21 @@ const instance = axios.create({
   timeout: 10000,
 });
 
-instance.interceptors.request.use((config) => {
-  const csrfToken = (() => {
-    const name = "csrf_token=";
-    const decoded = decodeURIComponent(document.cookie);
-    const cookies = decoded.split(";");
-    for (let cookie of cookies) {
-      cookie = cookie.trim();
-      if (cookie.startsWith(name)) {
-        return cookie.substring(name.length);
-      }
+export function getCsrfToken() {
+  const name = "csrf_token=";
+  const decoded = decodeURIComponent(document.cookie);
+  const cookies = decoded.split(";");
+  for (let cookie of cookies) {
+    cookie = cookie.trim();
+    if (cookie.startsWith(name)) {
+      return cookie.substring(name.length);
     }
-    return null;
-  })();
+  }
+  return null;
+}
+
+instance.interceptors.request.use((config) => {
+  const csrfToken = getCsrfToken();
 
   if (csrfToken) {
     config.headers["X-CSRF-Token"] = csrfToken;
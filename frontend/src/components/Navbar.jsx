@@ -168,8 +168,7 @@ const Navbar = ({ toggleSidebar }) => {
     setSearchResults([]);
     setSearchPerformed(false);
     try {
-      const res = await addChannel({ channelId });
-      const newChannel = res.data;
+      const newChannel = await addChannel({ channelId });
 
       setChannels((prev) => [...prev, newChannel]);
       updateChannel(newChannel);
@@ -177,7 +176,9 @@ const Navbar = ({ toggleSidebar }) => {
       closeAllModals();
       navigate("/app/dashboard");
     } catch (err) {
-      alert(err?.response?.data?.error || "Failed to add channel.");
+      alert(
+        err?.response?.data?.error || err?.message || "Failed to add channel.",
+      );
     } finally {
       setIsSubmitting(false);
     }
@@ -2,7 +2,7 @@ import { useState, useEffect } from "react";
 import { Helmet } from "react-helmet-async";
 import { useLocation } from "react-router-dom";
 import { useChannel } from "../context/ChannelContext";
-import { generateTitle } from "../api/apiRoutes";
+import { streamTitles } from "../api/apiRoutes";
 import useLoadingDots from "../utils/useLoadingDots";
 import Grid from "../components/Grid";
 import InfoCard from "../components/InfoCard";
@@ -62,8 +62,12 @@ function TitleGenerator() {
     setTitles([]);
 
     try {
-      const res = await generateTitle(ideaToUse, selectedChannel.channelId);
-      const titlesList = Array.isArray(res.titles) ? res.titles : [];
+      // Show each title as soon as it has been generated
+      const titlesList = await streamTitles(
+        ideaToUse,
+        selectedChannel.channelId,
+        (title) => setTitles((prev) => [...prev, title]),
+      );
       setTitles(titlesList);
 
       sessionStorage.setItem("streamline_title_idea", ideaToUse);